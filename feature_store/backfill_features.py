@@ -0,0 +1,287 @@
+"""
+Backfill Feature Store from Gold History
+Author: Patrick Cheung
+
+Replays Gold Parquet history into the Feature Store online store. Row groups
+are streamed with bounded memory, reduced to the latest record per card, and
+ingested in parallel with a resumable checkpoint per dt partition.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Any, Optional
+
+import pyarrow.dataset as ds
+
+from ingest_features import FeatureStoreIngester
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "spark_jobs"))
+
+from feature_groups import ENCODED_COLUMNS  # noqa: E402
+
+
+DT_PATTERN = re.compile(r"dt=(\d{4}-\d{2}-\d{2})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill Feature Store from Gold history")
+    parser.add_argument("--gold-path", required=True,
+                        help="Gold feature root, e.g. s3://bucket/gold/card_features")
+    parser.add_argument("--feature-group", required=True, help="Feature Group name")
+    parser.add_argument("--region", default="ap-southeast-1", help="AWS region")
+    parser.add_argument("--start-dt", help="First dt partition to replay (YYYY-MM-DD)")
+    parser.add_argument("--end-dt", help="Last dt partition to replay (YYYY-MM-DD)")
+    parser.add_argument("--record-id", default="card_id", help="Record identifier column")
+    parser.add_argument("--event-time", default="event_time", help="Event time column")
+    parser.add_argument("--batch-size", type=int, default=100, help="Records per put batch")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel ingestion threads")
+    parser.add_argument("--read-batch-rows", type=int, default=65536, help="Rows per streamed read batch")
+    parser.add_argument("--dictionary-path",
+                        help="Dictionary root for dictionary-encoded Gold, e.g. s3://bucket/gold/_dictionaries")
+    parser.add_argument("--checkpoint-file",
+                        help="Checkpoint log (default: .backfill_<feature-group>.jsonl)")
+    parser.add_argument("--dead-letter-file",
+                        help="JSON-lines file for rejected records (default: .backfill_<feature-group>.failed.jsonl)")
+    return parser.parse_args()
+
+
+def discover_partitions(gold_path: str, start_dt: Optional[str] = None,
+                        end_dt: Optional[str] = None) -> Dict[str, List[Any]]:
+    """
+    Group Gold Parquet fragments by dt partition (footers only, no data read)
+    """
+    dataset = ds.dataset(gold_path, format="parquet")
+
+    partitions = {}
+    for fragment in dataset.get_fragments():
+        match = DT_PATTERN.search(fragment.path)
+        if not match:
+            continue
+        dt = match.group(1)
+        if (start_dt and dt < start_dt) or (end_dt and dt > end_dt):
+            continue
+        partitions.setdefault(dt, []).append(fragment)
+
+    return partitions
+
+
+def load_dictionaries(dictionary_path: str) -> Dict[str, Dict[int, str]]:
+    """
+    Load {column: {code: value}} for every encoded column
+    """
+    dictionaries = {}
+    for column in ENCODED_COLUMNS:
+        table = ds.dataset(f"{dictionary_path}/{column}", format="parquet").to_table()
+        dictionaries[column] = dict(zip(
+            table.column("code").to_pylist(), table.column("value").to_pylist()
+        ))
+    return dictionaries
+
+
+def decode_record(row: Dict[str, Any], dictionaries: Dict[str, Dict[int, str]]) -> Dict[str, Any]:
+    for column, key_column in ENCODED_COLUMNS.items():
+        if key_column in row:
+            row[column] = dictionaries[column].get(row.pop(key_column))
+    return row
+
+
+def fragment_rows(fragment) -> int:
+    return sum(rg.num_rows for rg in fragment.row_groups)
+
+
+def reduce_latest(fragments, record_id: str, event_time: str, batch_rows: int,
+                  columns: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Stream a partition's row groups and keep only the latest record per id.
+
+    Memory is bounded by one read batch plus one record per distinct id.
+    """
+    latest = {}
+    for fragment in fragments:
+        for batch in fragment.to_batches(columns=columns, batch_size=batch_rows):
+            ids = batch.column(record_id).to_pylist()
+            times = batch.column(event_time).to_pylist()
+
+            # Pick winning row indexes first, materialize only those rows
+            winners = {}
+            for i, (rid, ts) in enumerate(zip(ids, times)):
+                if rid is None or ts is None:
+                    continue
+                current = latest.get(rid)
+                if current is not None and current[event_time] >= ts:
+                    continue
+                if rid not in winners or times[winners[rid]] < ts:
+                    winners[rid] = i
+
+            if not winners:
+                continue
+            rows = batch.take(list(winners.values())).to_pylist()
+            for row in rows:
+                latest[row[record_id]] = row
+
+    return latest
+
+
+class BackfillCheckpoint:
+    """
+    Resumable progress: completed partitions and ids already sent.
+
+    Partitions are replayed newest first, so an id sent once already carries
+    its latest record and older partitions skip it. Progress is an
+    append-only JSON-lines log with one line per completed partition holding
+    only the ids it newly sent, so each checkpoint costs O(partition ids).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed = []
+        self.sent_ids = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final line from an interrupted write
+                        continue
+                    self.completed.append(entry["dt"])
+                    self.sent_ids.update(entry["ids"])
+            print(f"Resuming from checkpoint {path}: {len(self.completed)} partitions done")
+
+    def mark_done(self, dt: str, ids):
+        new_ids = [rid for rid in ids if rid not in self.sent_ids]
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"dt": dt, "ids": new_ids}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.append(dt)
+        self.sent_ids.update(new_ids)
+
+
+def format_eta(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}h{minutes:02d}m{secs:02d}s"
+
+
+def write_dead_letters(path: str, dt: str, failures: List[Dict[str, Any]]):
+    """
+    Append rejected records with their error as JSON lines
+    """
+    with open(path, "a") as f:
+        for failure in failures:
+            f.write(json.dumps({
+                "dt": dt,
+                "record_id": failure["record_id"],
+                "code": failure["code"],
+                "message": failure["message"],
+                "record": failure["record"],
+            }, default=str) + "\n")
+
+
+def backfill(ingester: FeatureStoreIngester, partitions: Dict[str, List[Any]],
+             checkpoint: BackfillCheckpoint, record_id: str = "card_id",
+             event_time: str = "event_time", batch_size: int = 100,
+             workers: int = 8, batch_rows: int = 65536,
+             dictionaries: Optional[Dict[str, Dict[int, str]]] = None,
+             dead_letter_file: Optional[str] = None):
+    """
+    Replay partitions newest first into the Feature Store
+    
+    Records the Feature Store rejects (non-retryable errors) are appended to
+    dead_letter_file and the partition still completes; records that only
+    exhausted their retries fail the partition so a rerun resends them.
+    
+    With dictionaries, Gold holds integer keys: records are reduced by the
+    key column and decoded to strings just before they are sent.
+    """
+    read_names = list(ingester.feature_names)
+    if dictionaries:
+        read_names += [ENCODED_COLUMNS[c] for c in ingester.feature_names if c in ENCODED_COLUMNS]
+        record_id = ENCODED_COLUMNS.get(record_id, record_id)
+
+    pending = [dt for dt in sorted(partitions, reverse=True) if dt not in checkpoint.completed]
+    total_rows = sum(fragment_rows(f) for dt in pending for f in partitions[dt])
+    print(f"Backfilling {len(pending)} partitions, {total_rows} Gold rows")
+
+    started = time.time()
+    rows_done = 0
+    totals = {"success": 0, "dead_lettered": 0}
+
+    for dt in pending:
+        # Only read columns the Feature Group defines
+        available = set(partitions[dt][0].physical_schema.names)
+        columns = [name for name in read_names if name in available]
+        latest = reduce_latest(partitions[dt], record_id, event_time, batch_rows, columns)
+        records = [
+            {k: v for k, v in (decode_record(row, dictionaries) if dictionaries else row).items()
+             if v is not None}
+            for rid, row in latest.items() if rid not in checkpoint.sent_ids
+        ]
+
+        result = ingester.batch_put_records_parallel(records, batch_size, max_workers=workers)
+        retryable = [f for f in result["failures"] if f["retryable"]]
+        if retryable:
+            codes = sorted({f["code"] for f in retryable})
+            raise RuntimeError(
+                f"Partition dt={dt}: {len(retryable)} records still failing after retries "
+                f"({', '.join(codes)}); rerun to resume"
+            )
+        rejected = result["failures"]
+        if rejected:
+            if not dead_letter_file:
+                first = rejected[0]
+                raise RuntimeError(
+                    f"Partition dt={dt}: {len(rejected)} records rejected "
+                    f"(first: {first['record_id']}: {first['code']}: {first['message']})"
+                )
+            write_dead_letters(dead_letter_file, dt, rejected)
+            print(f"dt={dt}: {len(rejected)} rejected records written to {dead_letter_file}")
+            totals["dead_lettered"] += len(rejected)
+        totals["success"] += result["success"]
+        checkpoint.mark_done(dt, latest.keys())
+
+        rows_done += sum(fragment_rows(f) for f in partitions[dt])
+        elapsed = time.time() - started
+        rate = rows_done / elapsed if elapsed else 0.0
+        eta = (total_rows - rows_done) / rate if rate else 0.0
+        print(
+            f"dt={dt}: {len(records)} records sent | "
+            f"{rows_done}/{total_rows} rows | {rate:,.0f} rows/s | "
+            f"{totals['success'] / elapsed if elapsed else 0.0:,.0f} records/s | ETA {format_eta(eta)}"
+        )
+
+    print(
+        f"Backfill complete: {totals['success']} records, {totals['dead_lettered']} dead-lettered "
+        f"in {format_eta(time.time() - started)}"
+    )
+    return totals
+
+
+def main():
+    args = parse_args()
+    checkpoint_file = args.checkpoint_file or f".backfill_{args.feature_group}.jsonl"
+    dead_letter_file = args.dead_letter_file or f".backfill_{args.feature_group}.failed.jsonl"
+
+    partitions = discover_partitions(args.gold_path, args.start_dt, args.end_dt)
+    if not partitions:
+        print(f"No Gold partitions found under {args.gold_path}")
+        return
+
+    ingester = FeatureStoreIngester(args.feature_group, region=args.region)
+    dictionaries = load_dictionaries(args.dictionary_path) if args.dictionary_path else None
+    backfill(
+        ingester, partitions, BackfillCheckpoint(checkpoint_file),
+        record_id=args.record_id, event_time=args.event_time,
+        batch_size=args.batch_size, workers=args.workers,
+        batch_rows=args.read_batch_rows, dictionaries=dictionaries,
+        dead_letter_file=dead_letter_file
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,18 @@ Author: Patrick Cheung
 Utility functions for upserting features to Feature Store.
 """
 
+import os
+import sys
 import boto3
 import pandas as pd
+from botocore.exceptions import ClientError
 from typing import List, Dict, Any
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "spark_jobs"))
+
+from feature_store_writes import RETRYABLE_ERROR_CODES, error_code, put_record_with_retry  # noqa: E402
 
 
 class FeatureStoreIngester:
@@ -72,31 +80,56 @@ class FeatureStoreIngester:
         
         for i in range(0, total_records, batch_size):
             batch = records[i:i + batch_size]
-            prepared_batch = [
-                {"Record": self.prepare_record(record)} for record in batch
-            ]
+            failures = self._put_batch(batch)
             
-            try:
-                response = self.client.batch_put_record(
-                    FeatureGroupName=self.feature_group_name,
-                    Records=prepared_batch
-                )
-                
-                # Check for errors in response
-                if "Errors" in response and response["Errors"]:
-                    error_count += len(response["Errors"])
-                    print(f"Batch {i//batch_size + 1}: {len(response['Errors'])} errors")
-                else:
-                    success_count += len(batch)
-                    print(f"Batch {i//batch_size + 1}: {len(batch)} records ingested")
-                
-            except Exception as e:
-                print(f"Error in batch {i//batch_size + 1}: {e}")
-                error_count += len(batch)
+            if failures:
+                error_count += len(failures)
+                codes = sorted({f["code"] for f in failures})
+                print(f"Batch {i//batch_size + 1}: {len(failures)} errors ({', '.join(codes)})")
+            else:
+                print(f"Batch {i//batch_size + 1}: {len(batch)} records ingested")
+            success_count += len(batch) - len(failures)
         
         print(f"Ingestion complete: {success_count} success, {error_count} errors")
         return {"success": success_count, "errors": error_count}
     
+    def _put_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Send one batch record by record and return the failed records with
+        their identifier, error code and whether the error was retryable
+        (i.e. retries were exhausted rather than the record rejected)
+        """
+        record_id_name = self.feature_group_info["RecordIdentifierFeatureName"]
+        failures = []
+        for record in batch:
+            try:
+                put_record_with_retry(self.client, self.feature_group_name, self.prepare_record(record))
+            except ClientError as e:
+                failures.append({
+                    "record_id": str(record.get(record_id_name)),
+                    "code": error_code(e),
+                    "message": e.response["Error"].get("Message", ""),
+                    "retryable": error_code(e) in RETRYABLE_ERROR_CODES,
+                    "record": record,
+                })
+        return failures
+    
+    def batch_put_records_parallel(self, records: List[Dict[str, Any]], batch_size: int = 100,
+                                   max_workers: int = 8):
+        """
+        Ingest records with PutRecord across a thread pool (boto3 clients are
+        thread-safe); the runtime API has no batch put, so batches only group
+        records per task. Non-API errors propagate.
+        """
+        batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            failures = [f for batch_failures in executor.map(self._put_batch, batches)
+                        for f in batch_failures]
+        
+        return {"success": len(records) - len(failures), "errors": len(failures),
+                "failures": failures}
+    
     def ingest_from_dataframe(self, df: pd.DataFrame, batch_size: int = 100):
         """
         Ingest features from a Pandas DataFrame
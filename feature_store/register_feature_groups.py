@@ -2,12 +2,204 @@
 Register SageMaker Feature Groups
 Author: Patrick Cheung
 
-Creates and configures SageMaker Feature Groups for the project.
+Creates and configures SageMaker Feature Groups for the project from the
+declarative registry (feature_group_registry.json). Feature definitions are
+derived from the same specs the Gold job uses (spark_jobs/feature_groups.py);
+a new version (<base_name>_vN) is only created when the definitions differ
+from the latest registered version. Creates run concurrently and readiness is
+polled for all pending groups together with exponential backoff.
+
+Each registry entry pins "feature_group", the version the pipeline writes
+(Terraform reads the card_features pin for the job's --feature-group).
+Registration refuses to create any other version, so a schema change only
+lands together with a pin bump that points the job at it. The registry is
+the only owner of the Feature Groups; Terraform only provides the role and
+offline store location (--role-arn / --offline-store-s3-uri in deploy).
 """
 
-import boto3
+import os
+import re
+import sys
+import json
 import time
-from botocore.exceptions import ClientError
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "spark_jobs"))
+
+from feature_groups import (  # noqa: E402
+    EVENT_TIME_FEATURE, FEATURE_GROUPS, feature_definitions, resolve_spec
+)
+
+
+DEFAULT_REGISTRY = os.path.join(os.path.dirname(__file__), "feature_group_registry.json")
+VERSION_PATTERN = re.compile(r"^(?P<base>.+)_v(?P<version>\d+)$")
+
+
+class SageMakerBackend:
+    """
+    Feature Group control plane backed by the SageMaker API
+    """
+
+    def __init__(self, region="ap-southeast-1"):
+        import boto3
+        self.client = boto3.client("sagemaker", region_name=region)
+
+    def describe(self, name):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.describe_feature_group(FeatureGroupName=name)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFound":
+                raise
+            return None
+
+    def create(self, **kwargs):
+        return self.client.create_feature_group(**kwargs)
+
+    def list_names(self, name_contains):
+        names = []
+        paginator = self.client.get_paginator("list_feature_groups")
+        for page in paginator.paginate(NameContains=name_contains):
+            names += [s["FeatureGroupName"] for s in page["FeatureGroupSummaries"]]
+        return names
+
+
+class LocalBackend:
+    """
+    In-memory stand-in for offline runs and tests; optionally persisted to a
+    JSON file. New groups report "Creating" for `polls_until_created` describes.
+    """
+
+    def __init__(self, state_file=None, polls_until_created=2):
+        self.state_file = state_file
+        self.polls_until_created = polls_until_created
+        self.groups = {}
+        # Registration calls the backend from thread pools
+        self._lock = threading.Lock()
+        if state_file and os.path.exists(state_file):
+            with open(state_file) as f:
+                self.groups = json.load(f)
+
+    def _save(self):
+        # Caller holds self._lock
+        if self.state_file:
+            with open(self.state_file, "w") as f:
+                json.dump(self.groups, f, indent=2)
+
+    def describe(self, name):
+        with self._lock:
+            group = self.groups.get(name)
+            if group is None:
+                return None
+            if group["FeatureGroupStatus"] == "Creating":
+                group["_polls"] = group.get("_polls", 0) + 1
+                if group["_polls"] >= self.polls_until_created:
+                    group["FeatureGroupStatus"] = "Created"
+                self._save()
+            return {k: v for k, v in group.items() if not k.startswith("_")}
+
+    def create(self, **kwargs):
+        name = kwargs["FeatureGroupName"]
+        with self._lock:
+            if name in self.groups:
+                raise ValueError(f"Feature Group {name} already exists")
+            arn = f"arn:aws:sagemaker:local:000000000000:feature-group/{name}"
+            self.groups[name] = dict(kwargs, FeatureGroupArn=arn, FeatureGroupStatus="Creating")
+            self._save()
+        return {"FeatureGroupArn": arn}
+
+    def list_names(self, name_contains):
+        with self._lock:
+            return [name for name in self.groups if name_contains in name]
+
+
+def load_registry(path, role_arn=None, offline_store_s3_uri=None):
+    """
+    Resolve registry entries into desired feature group configs; role_arn and
+    offline_store_s3_uri override the registry-wide defaults
+    """
+    with open(path) as f:
+        registry = json.load(f)
+    if role_arn:
+        registry["role_arn"] = role_arn
+    if offline_store_s3_uri:
+        registry["offline_store_s3_uri"] = offline_store_s3_uri
+
+    desired = []
+    for entry in registry["feature_groups"]:
+        spec = resolve_spec(FEATURE_GROUPS[entry["spec"]], enriched=entry.get("enriched", False))
+        match = VERSION_PATTERN.match(spec["feature_group"])
+        base_name = entry.get("base_name") or (match.group("base") if match else spec["feature_group"])
+        desired.append({
+            "base_name": base_name,
+            "feature_group": entry.get("feature_group"),
+            "record_identifier_name": spec["entity_key"],
+            "event_time_feature_name": EVENT_TIME_FEATURE,
+            "feature_definitions": feature_definitions(spec),
+            "description": entry.get("description", spec.get("description", "")),
+            "online": entry.get("online", True),
+            "s3_uri": entry.get("offline_store_s3_uri", registry["offline_store_s3_uri"]),
+            "role_arn": entry.get("role_arn", registry["role_arn"]),
+        })
+    return registry, desired
+
+
+def latest_version(backend, base_name):
+    """
+    (name, version) of the highest registered <base_name>_vN, or (None, 0)
+    """
+    latest = (None, 0)
+    for name in backend.list_names(base_name):
+        match = VERSION_PATTERN.match(name)
+        if match and match.group("base") == base_name and int(match.group("version")) > latest[1]:
+            latest = (name, int(match.group("version")))
+    return latest
+
+
+def diff_schema(current, config):
+    """
+    Differences between a described feature group and a desired config
+    """
+    current_defs = {d["FeatureName"]: d["FeatureType"] for d in current["FeatureDefinitions"]}
+    desired_defs = {d["FeatureName"]: d["FeatureType"] for d in config["feature_definitions"]}
+
+    diff = {
+        "added": sorted(set(desired_defs) - set(current_defs)),
+        "removed": sorted(set(current_defs) - set(desired_defs)),
+        "changed": sorted(
+            name for name in set(desired_defs) & set(current_defs)
+            if desired_defs[name] != current_defs[name]
+        ),
+    }
+    if current["RecordIdentifierFeatureName"] != config["record_identifier_name"]:
+        diff["record_identifier"] = config["record_identifier_name"]
+    if current["EventTimeFeatureName"] != config["event_time_feature_name"]:
+        diff["event_time"] = config["event_time_feature_name"]
+    return {k: v for k, v in diff.items() if v}
+
+
+def plan_feature_group(backend, config):
+    """
+    Decide whether a config needs a new version: returns a plan dict
+    """
+    name, version = latest_version(backend, config["base_name"])
+    if name is None:
+        return {"action": "create", "name": f"{config['base_name']}_v1", "config": config}
+
+    current = backend.describe(name)
+    diff = diff_schema(current, config)
+    if not diff:
+        return {"action": "unchanged", "name": name, "config": config}
+    return {
+        "action": "new_version",
+        "name": f"{config['base_name']}_v{version + 1}",
+        "previous": name,
+        "diff": diff,
+        "config": config,
+    }
 
 
 def create_feature_group(
@@ -17,102 +209,172 @@ def create_feature_group(
     feature_definitions,
     s3_uri,
     role_arn,
-    region="ap-southeast-1"
+    region="ap-southeast-1",
+    description="Real-time card transaction features for fraud detection",
+    online=True,
+    backend=None,
+    wait=True
 ):
     """
     Create a SageMaker Feature Group with Online and Offline store
     """
-    client = boto3.client("sagemaker", region_name=region)
-    
+    backend = backend or SageMakerBackend(region)
+
     try:
         # Check if feature group already exists
-        try:
-            response = client.describe_feature_group(FeatureGroupName=feature_group_name)
+        response = backend.describe(feature_group_name)
+        if response is not None:
             print(f"Feature Group '{feature_group_name}' already exists")
             return response
-        except ClientError as e:
-            if e.response["Error"]["Code"] != "ResourceNotFound":
-                raise
-        
+
         # Create feature group
         print(f"Creating Feature Group: {feature_group_name}")
-        response = client.create_feature_group(
+        response = backend.create(
             FeatureGroupName=feature_group_name,
             RecordIdentifierFeatureName=record_identifier_name,
             EventTimeFeatureName=event_time_feature_name,
             FeatureDefinitions=feature_definitions,
-            OnlineStoreConfig={"EnableOnlineStore": True},
+            OnlineStoreConfig={"EnableOnlineStore": online},
             OfflineStoreConfig={
                 "S3StorageConfig": {"S3Uri": s3_uri},
                 "DisableGlueTableCreation": False
             },
             RoleArn=role_arn,
-            Description="Real-time card transaction features for fraud detection"
+            Description=description
         )
-        
+
         print(f"Feature Group created: {response['FeatureGroupArn']}")
-        
-        # Wait for feature group to be created
-        print("Waiting for Feature Group to be created...")
-        while True:
-            status_response = client.describe_feature_group(
-                FeatureGroupName=feature_group_name
-            )
-            status = status_response["FeatureGroupStatus"]
-            
-            if status == "Created":
-                print("Feature Group is ready")
-                break
-            elif status == "CreateFailed":
-                raise Exception("Feature Group creation failed")
-            
-            print(f"Status: {status}, waiting...")
-            time.sleep(10)
-        
+
+        if wait:
+            wait_for_feature_groups(backend, [feature_group_name])
+
         return response
-        
+
     except Exception as e:
         print(f"Error creating feature group: {e}")
         raise
 
 
+def wait_for_feature_groups(backend, names, initial_delay=1.0, max_delay=30.0,
+                            timeout=900.0, max_workers=8):
+    """
+    Poll all pending feature groups together until Created, backing off
+    exponentially (with jitter) between rounds
+    """
+    pending = set(names)
+    delay = initial_delay
+    deadline = time.monotonic() + timeout
+
+    print(f"Waiting for Feature Groups: {sorted(pending)}")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending:
+            polled = sorted(pending)
+            statuses = dict(zip(polled, executor.map(
+                lambda n: backend.describe(n)["FeatureGroupStatus"], polled
+            )))
+
+            failed = [name for name, status in statuses.items() if status == "CreateFailed"]
+            if failed:
+                raise Exception(f"Feature Group creation failed: {failed}")
+
+            ready = {name for name, status in statuses.items() if status == "Created"}
+            for name in sorted(ready):
+                print(f"Feature Group '{name}' is ready")
+            pending -= ready
+
+            if not pending:
+                break
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Feature Groups not ready after {timeout}s: {sorted(pending)}")
+
+            print(f"Status: {statuses}, waiting {delay:.1f}s...")
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, max_delay)
+
+
+def register_feature_groups(backend, desired, max_workers=8, dry_run=False, region="ap-southeast-1"):
+    """
+    Plan and apply registry configs concurrently; returns the plans
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        plans = list(executor.map(lambda c: plan_feature_group(backend, c), desired))
+
+    for plan in plans:
+        detail = f" (from {plan['previous']}: {plan['diff']})" if plan["action"] == "new_version" else ""
+        print(f"{plan['config']['base_name']}: {plan['action']} -> {plan['name']}{detail}")
+
+    # The pipeline writes the pinned version; never create one it won't use
+    unpinned = [
+        plan for plan in plans
+        if plan["config"]["feature_group"] and plan["name"] != plan["config"]["feature_group"]
+    ]
+    for plan in unpinned:
+        print(
+            f"{plan['config']['base_name']}: plan targets {plan['name']} but the registry pins "
+            f"{plan['config']['feature_group']}; update the pin and the pipeline's "
+            f"feature_group_name together"
+        )
+    if unpinned and not dry_run:
+        raise ValueError(f"Registry pins do not match the plan: {[plan['name'] for plan in unpinned]}")
+
+    to_create = [plan for plan in plans if plan["action"] != "unchanged"]
+    if dry_run or not to_create:
+        return plans
+
+    def create(plan):
+        config = plan["config"]
+        return create_feature_group(
+            feature_group_name=plan["name"],
+            record_identifier_name=config["record_identifier_name"],
+            event_time_feature_name=config["event_time_feature_name"],
+            feature_definitions=config["feature_definitions"],
+            s3_uri=config["s3_uri"],
+            role_arn=config["role_arn"],
+            region=region,
+            description=config["description"],
+            online=config["online"],
+            backend=backend,
+            wait=False
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(create, to_create))
+
+    wait_for_feature_groups(backend, [plan["name"] for plan in to_create], max_workers=max_workers)
+    return plans
+
+
 def main():
     """
     Main function to register feature groups
     """
-    # Feature definitions for card transaction features
-    feature_definitions = [
-        {"FeatureName": "card_id", "FeatureType": "String"},
-        {"FeatureName": "event_id", "FeatureType": "String"},
-        {"FeatureName": "merchant_id", "FeatureType": "String"},
-        {"FeatureName": "amount", "FeatureType": "Fractional"},
-        {"FeatureName": "currency", "FeatureType": "String"},
-        {"FeatureName": "country", "FeatureType": "String"},
-        {"FeatureName": "pos_mode", "FeatureType": "String"},
-        {"FeatureName": "event_time", "FeatureType": "Fractional"},
-        {"FeatureName": "txn_count_1h", "FeatureType": "Integral"},
-        {"FeatureName": "txn_amount_1h", "FeatureType": "Fractional"},
-        {"FeatureName": "merchant_count_24h", "FeatureType": "Integral"},
-        {"FeatureName": "avg_amount_7d", "FeatureType": "Fractional"}
-    ]
-    
-    # Configuration (should be passed as arguments or from environment)
-    feature_group_name = "rt_card_features_v1"
-    s3_bucket = "your-datalake-bucket"  # Replace with actual bucket
-    s3_uri = f"s3://{s3_bucket}/feature-store/offline"
-    role_arn = "arn:aws:iam::ACCOUNT_ID:role/SageMakerFeatureStoreRole"  # Replace
-    
-    # Create feature group
-    create_feature_group(
-        feature_group_name=feature_group_name,
-        record_identifier_name="card_id",
-        event_time_feature_name="event_time",
-        feature_definitions=feature_definitions,
-        s3_uri=s3_uri,
-        role_arn=role_arn
+    parser = argparse.ArgumentParser(description="Register SageMaker Feature Groups from the registry")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY, help="Feature group registry JSON")
+    parser.add_argument("--backend", choices=["sagemaker", "local"], default="sagemaker",
+                        help="Control plane backend (local = offline stub)")
+    parser.add_argument("--local-state", help="JSON state file for the local backend")
+    parser.add_argument("--max-workers", type=int, default=8, help="Concurrent create/describe calls")
+    parser.add_argument("--role-arn", help="Feature Store role ARN (overrides the registry)")
+    parser.add_argument("--offline-store-s3-uri", help="Offline store S3 URI (overrides the registry)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan")
+    args = parser.parse_args()
+
+    registry, desired = load_registry(
+        args.registry, role_arn=args.role_arn, offline_store_s3_uri=args.offline_store_s3_uri
     )
-    
+    region = registry.get("region", "ap-southeast-1")
+
+    if args.backend == "local":
+        backend = LocalBackend(state_file=args.local_state)
+    else:
+        backend = SageMakerBackend(region)
+
+    plans = register_feature_groups(
+        backend, desired, max_workers=args.max_workers, dry_run=args.dry_run, region=region
+    )
+
     print("Feature Group registration completed")
+    print("Active versions: " + ", ".join(plan["name"] for plan in plans))
 
 
 if __name__ == "__main__":
@@ -1,3 +1,13 @@
+# Feature Groups are owned by the registry (feature_store/register_feature_groups.py);
+# the pipeline writes the card group version pinned there
+locals {
+  feature_group_registry = jsondecode(file("${path.module}/../../feature_store/feature_group_registry.json"))
+  feature_group_name     = one([
+    for group in local.feature_group_registry.feature_groups : group.feature_group
+    if group.spec == "card_features"
+  ])
+}
+
 # S3 Datalake Module
 module "s3_datalake" {
   source = "./modules/s3_datalake"
@@ -29,7 +39,6 @@ module "emr_serverless" {
   datalake_bucket_arn   = module.s3_datalake.bucket_arn
   code_bucket_name      = module.s3_datalake.code_bucket_name
   code_bucket_arn       = module.s3_datalake.code_bucket_arn
-  feature_group_name    = var.feature_group_name
 }
 
 # Glue Module
@@ -48,7 +57,6 @@ module "sagemaker_featurestore" {
 
   project_name          = var.project_name
   environment           = var.environment
-  feature_group_name    = var.feature_group_name
   datalake_bucket_name  = module.s3_datalake.bucket_name
 }
 
@@ -62,7 +70,7 @@ module "step_functions" {
   emr_job_role_arn        = module.emr_serverless.job_role_arn
   datalake_bucket_name    = module.s3_datalake.bucket_name
   code_bucket_name        = module.s3_datalake.code_bucket_name
-  feature_group_name      = var.feature_group_name
+  feature_group_name      = local.feature_group_name
   glue_database_name      = module.glue.database_name
   glue_crawler_name       = module.glue.gold_crawler_name
 }
@@ -81,7 +89,7 @@ module "eventbridge" {
   emr_job_role_arn                  = module.emr_serverless.job_role_arn
   datalake_bucket_name              = module.s3_datalake.bucket_name
   code_bucket_name                  = module.s3_datalake.code_bucket_name
-  feature_group_name                = var.feature_group_name
+  feature_group_name                = local.feature_group_name
 }
 
 # CloudWatch Module
@@ -101,7 +101,7 @@ resource "aws_iam_role_policy" "emr_job" {
           "sagemaker:DescribeFeatureGroup",
           "sagemaker:PutRecord"
         ]
-        Resource = "arn:aws:sagemaker:*:*:feature-group/${var.feature_group_name}"
+        Resource = "arn:aws:sagemaker:*:*:feature-group/${var.feature_group_name_pattern}"
       },
       {
         Effect = "Allow"
@@ -109,7 +109,19 @@ resource "aws_iam_role_policy" "emr_job" {
           "sagemaker-featurestore-runtime:BatchPutRecord",
           "sagemaker-featurestore-runtime:PutRecord"
         ]
-        Resource = "arn:aws:sagemaker:*:*:feature-group/${var.feature_group_name}"
+        Resource = "arn:aws:sagemaker:*:*:feature-group/${var.feature_group_name_pattern}"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "cloudwatch:PutMetricData"
+        ]
+        Resource = "*"
+        Condition = {
+          StringEquals = {
+            "cloudwatch:namespace" = "P1Unified"
+          }
+        }
       },
       {
         Effect = "Allow"
@@ -40,7 +40,8 @@ variable "kms_key_arn" {
   default     = null
 }
 
-variable "feature_group_name" {
-  description = "SageMaker Feature Group name"
+variable "feature_group_name_pattern" {
+  description = "Feature Group name pattern the jobs may describe and write (covers every registered group and version)"
   type        = string
+  default     = "rt_*"
 }
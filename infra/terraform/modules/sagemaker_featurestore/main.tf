@@ -41,80 +41,5 @@ resource "aws_iam_role_policy" "featurestore" {
   })
 }
 
-# SageMaker Feature Group
-resource "aws_sagemaker_feature_group" "main" {
-  feature_group_name             = var.feature_group_name
-  record_identifier_feature_name = "card_id"
-  event_time_feature_name        = "event_time"
-  role_arn                       = aws_iam_role.featurestore.arn
-
-  feature_definition {
-    feature_name = "card_id"
-    feature_type = "String"
-  }
-
-  feature_definition {
-    feature_name = "event_time"
-    feature_type = "Fractional"
-  }
-
-  feature_definition {
-    feature_name = "event_id"
-    feature_type = "String"
-  }
-
-  feature_definition {
-    feature_name = "merchant_id"
-    feature_type = "String"
-  }
-
-  feature_definition {
-    feature_name = "amount"
-    feature_type = "Fractional"
-  }
-
-  feature_definition {
-    feature_name = "currency"
-    feature_type = "String"
-  }
-
-  feature_definition {
-    feature_name = "country"
-    feature_type = "String"
-  }
-
-  feature_definition {
-    feature_name = "pos_mode"
-    feature_type = "String"
-  }
-
-  feature_definition {
-    feature_name = "txn_count_1h"
-    feature_type = "Integral"
-  }
-
-  feature_definition {
-    feature_name = "txn_amount_1h"
-    feature_type = "Fractional"
-  }
-
-  feature_definition {
-    feature_name = "merchant_count_24h"
-    feature_type = "Integral"
-  }
-
-  feature_definition {
-    feature_name = "avg_amount_7d"
-    feature_type = "Fractional"
-  }
-
-  online_store_config {
-    enable_online_store = true
-  }
-
-  offline_store_config {
-    s3_storage_config {
-      s3_uri     = "s3://${var.datalake_bucket_name}/feature-store/offline"
-    }
-  }
-}
+# Feature Groups are created by feature_store/register_feature_groups.py from
+# feature_store/feature_group_registry.json, using this role
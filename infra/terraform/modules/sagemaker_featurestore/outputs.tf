@@ -1,9 +1,9 @@
-output "feature_group_name" {
-  description = "SageMaker Feature Group name"
-  value       = aws_sagemaker_feature_group.main.feature_group_name
+output "role_arn" {
+  description = "IAM role the registered Feature Groups use"
+  value       = aws_iam_role.featurestore.arn
 }
 
-output "feature_group_arn" {
-  description = "SageMaker Feature Group ARN"
-  value       = aws_sagemaker_feature_group.main.arn
+output "offline_store_s3_uri" {
+  description = "Offline store S3 URI for the registered Feature Groups"
+  value       = "s3://${var.datalake_bucket_name}/feature-store/offline"
 }
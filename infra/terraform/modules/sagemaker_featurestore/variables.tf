@@ -8,11 +8,6 @@ variable "environment" {
   type        = string
 }
 
-variable "feature_group_name" {
-  description = "SageMaker Feature Group name"
-  type        = string
-}
-
 variable "datalake_bucket_name" {
   description = "Datalake S3 bucket name"
   type        = string
@@ -24,8 +24,18 @@ output "emr_job_role_arn" {
 }
 
 output "feature_group_name" {
-  description = "SageMaker Feature Group name"
-  value       = module.sagemaker_featurestore.feature_group_name
+  description = "Card Feature Group version the pipeline writes (pinned in feature_group_registry.json)"
+  value       = local.feature_group_name
+}
+
+output "featurestore_role_arn" {
+  description = "IAM role for registered Feature Groups"
+  value       = module.sagemaker_featurestore.role_arn
+}
+
+output "offline_store_s3_uri" {
+  description = "Offline store S3 URI for registered Feature Groups"
+  value       = module.sagemaker_featurestore.offline_store_s3_uri
 }
 
 output "step_function_arn" {
@@ -45,9 +45,3 @@ variable "daily_pipeline_schedule_cron" {
   type        = string
   default     = "cron(0 2 * * ? *)"
 }
-
-variable "feature_group_name" {
-  description = "SageMaker Feature Group name"
-  type        = string
-  default     = "rt_card_features_v1"
-}
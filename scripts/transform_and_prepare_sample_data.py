@@ -8,12 +8,18 @@ Author: Patrick Cheung
 import json
 import gzip
 import os
+import sys
+import time
 from pathlib import Path
 from datetime import datetime
 import argparse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "spark_jobs"))
+
+from data_quality import REASON_COLUMN, WARNING_COLUMN, validate_pandas  # noqa: E402
+
 
 def read_ndjson(file_path: str) -> List[Dict[str, Any]]:
     """Read NDJSON file and return list of records."""
@@ -25,12 +31,15 @@ def read_ndjson(file_path: str) -> List[Dict[str, Any]]:
     return records
 
 
-def transform_records(records: List[Dict[str, Any]]) -> pd.DataFrame:
+def transform_records(records: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Transform records to desired schema with validation.
     
     Expected fields:
     - event_id, card_id, ts, merchant_id, amount, currency, country, pos_mode
+    
+    Rows are checked with the same data-quality rules as the Silver job.
+    Returns (valid rows, quarantined rows with dq_reason_codes).
     """
     df = pd.DataFrame(records)
     
@@ -41,14 +50,25 @@ def transform_records(records: List[Dict[str, Any]]) -> pd.DataFrame:
     if missing:
         raise ValueError(f"Missing columns: {missing}")
     
+    df = df[required_cols]  # Keep only required columns
+    
+    # Data-quality rules (shared with spark_jobs/silver_and_gold.py)
+    validated, counters = validate_pandas(df, reference_ts=time.time())
+    failed = {code: n for code, n in counters.items()
+              if n and code not in ('total_rows', 'quarantined_rows', 'warned_rows')}
+    if failed:
+        print(f"⚠️  Data quality failures: {failed}")
+    
+    quarantine_df = validated[validated[REASON_COLUMN] != '']
+    df = validated[validated[REASON_COLUMN] == ''].drop(columns=[REASON_COLUMN, WARNING_COLUMN])
+    
     # Convert timestamp to datetime
     df['ts'] = pd.to_datetime(df['ts'], unit='s')
     
     # Type conversions
     df['amount'] = df['amount'].astype(float)
-    df = df[required_cols]  # Keep only required columns
     
-    return df
+    return df, quarantine_df
 
 
 def save_as_compressed_json(df: pd.DataFrame, output_file: str) -> None:
@@ -150,9 +170,16 @@ def main():
         print(f"✓ Loaded {len(records)} records")
         
         print(f"🔄 Transforming records...")
-        df = transform_records(records)
+        df, quarantine_df = transform_records(records)
         print(f"✓ Transformed {len(df)} records")
         
+        if not quarantine_df.empty:
+            quarantine_file = os.path.join(
+                args.output_dir, 'quarantine', 'card_authorization', 'data.json.gz'
+            )
+            save_as_compressed_json(quarantine_df, quarantine_file)
+            print(f"⚠️  Quarantined {len(quarantine_df)} records")
+        
         print(f"💾 Saving as {args.format.upper()} to {args.output_dir}...")
         partition_path = create_bronze_directory_structure(
             df, 
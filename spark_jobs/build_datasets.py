@@ -5,14 +5,20 @@ Author: Patrick Cheung
 Reads Gold layer data and builds training and inference datasets.
 """
 
+import time
+JOB_START = time.perf_counter()
+
 import sys
 import argparse
-from datetime import datetime, timedelta
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, lit, row_number, rand
+from datetime import datetime, timedelta, timezone
+from pyspark.sql.functions import col, lit, row_number, rand, when, pmod, xxhash64
 from pyspark.sql.window import Window
 import json
 
+from job_bootstrap import IO_PROFILES, StartupTimer, create_spark_session
+from feature_stats import rollup_daily_stats, merge_stats, drift_report
+from dictionary_encoding import ENCODED_COLUMNS, decode_columns
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Build training and inference datasets")
@@ -21,27 +27,83 @@ def parse_args():
     parser.add_argument("--training-prefix", required=True, help="Training prefix")
     parser.add_argument("--inference-prefix", required=True, help="Inference prefix")
     parser.add_argument("--lookback-days", type=int, default=30, help="Lookback days for training")
-    return parser.parse_args()
+    parser.add_argument("--feature-stats", action="store_true",
+                        help="Roll up per-run feature statistics and report drift vs the training window")
+    parser.add_argument("--split-mode", choices=["random", "hash", "kfold", "time"], default="random",
+                        help="Train/validation split: random, hash of --split-key, k-fold or time holdout")
+    parser.add_argument("--split-key", default="card_id", help="Column hashed for hash/kfold splits")
+    parser.add_argument("--validation-fraction", type=float, default=0.2, help="Validation fraction")
+    parser.add_argument("--num-folds", type=int, default=5, help="Number of folds for kfold split")
+    parser.add_argument("--holdout-days", type=int, default=3, help="Trailing days held out for time split")
+    parser.add_argument("--io-profile", choices=sorted(IO_PROFILES), default="default",
+                        help="S3 I/O profile (committer, upload and read tuning)")
+    args = parser.parse_args()
+    if not 0 < args.validation_fraction < 1:
+        parser.error("--validation-fraction must be between 0 and 1 (exclusive)")
+    if args.num_folds < 2:
+        parser.error("--num-folds must be at least 2")
+    return args
+
+
+# Hash space for deterministic splits (validation fraction resolution is 0.1%)
+SPLIT_BUCKETS = 1000
+
+
+def assign_split(df, split_mode, split_key="card_id", validation_fraction=0.2,
+                 num_folds=5, holdout_start_ts=None):
+    """
+    Add a deterministic split partition column to the training DataFrame.
+    
+    hash:  split=train|validation from xxhash64(split_key), so every row of a
+           card lands on the same side regardless of partitioning
+    kfold: fold=0..num_folds-1 from xxhash64(split_key) mod num_folds, so
+           folds are equal-sized in expectation for any num_folds
+    time:  split=validation for events at or after holdout_start_ts
+    
+    Returns (DataFrame, partition column name).
+    """
+    key_hash = xxhash64(col(split_key))
+    
+    if split_mode == "hash":
+        bucket = pmod(key_hash, lit(SPLIT_BUCKETS))
+        threshold = round(validation_fraction * SPLIT_BUCKETS)
+        return df.withColumn(
+            "split", when(bucket < threshold, lit("validation")).otherwise(lit("train"))
+        ), "split"
+    
+    if split_mode == "kfold":
+        return df.withColumn("fold", pmod(key_hash, lit(num_folds)).cast("int")), "fold"
+    
+    if split_mode == "time":
+        return df.withColumn(
+            "split",
+            when(col("event_time") >= lit(holdout_start_ts), lit("validation")).otherwise(lit("train"))
+        ), "split"
+    
+    raise ValueError(f"Unsupported split mode: {split_mode}")
 
 
-def create_spark_session():
-    return SparkSession.builder \
-        .appName("BuildDatasets") \
-        .config("spark.sql.adaptive.enabled", "true") \
-        .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
-        .config("spark.hadoop.fs.s3a.aws.credentials.provider", 
-                "com.amazonaws.auth.DefaultAWSCredentialsProviderChain") \
-        .getOrCreate()
+def decode_gold(spark, gold_df, gold_path):
+    """
+    Restore string columns when Gold was written with --dictionary-encode,
+    so datasets and split keys never expose integer surrogate keys
+    """
+    if not any(key_column in gold_df.columns for key_column in ENCODED_COLUMNS.values()):
+        return gold_df
+    print(f"Decoding dictionary-encoded Gold columns from {gold_path}/_dictionaries")
+    return decode_columns(spark, gold_df, f"{gold_path}/_dictionaries")
 
 
-def build_training_dataset(spark, gold_path, training_path, lookback_days):
+def build_training_dataset(spark, gold_path, training_path, lookback_days, feature_stats=False,
+                           split_mode="random", split_key="card_id", validation_fraction=0.2,
+                           num_folds=5, holdout_days=3):
     """
     Build training dataset from Gold layer
     """
     print(f"Building training dataset from {gold_path}")
     
-    # Calculate date range
-    end_date = datetime.utcnow()
+    # Calculate date range (timezone-aware, so timestamp() is epoch UTC)
+    end_date = datetime.now(timezone.utc)
     start_date = end_date - timedelta(days=lookback_days)
     
     # Read Gold data
@@ -51,6 +113,7 @@ def build_training_dataset(spark, gold_path, training_path, lookback_days):
     training_df = gold_df.filter(
         col("dt").between(start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
     )
+    training_df = decode_gold(spark, training_df, gold_path)
     
     # Add label (simulated fraud detection label for demo)
     # In production, this would come from actual fraud labels
@@ -59,32 +122,92 @@ def build_training_dataset(spark, gold_path, training_path, lookback_days):
         (col("amount") > 1000).cast("int")  # Simple heuristic for demo
     )
     
-    # Train/validation split (80/20)
-    train_df, val_df = training_with_label.randomSplit([0.8, 0.2], seed=42)
-    
-    # Write training set
-    train_output = f"{training_path}/dt={end_date.strftime('%Y-%m-%d')}/train"
-    print(f"Writing training data to {train_output}")
-    train_df.write.mode("overwrite").parquet(train_output)
-    
-    # Write validation set
-    val_output = f"{training_path}/dt={end_date.strftime('%Y-%m-%d')}/validation"
-    print(f"Writing validation data to {val_output}")
-    val_df.write.mode("overwrite").parquet(val_output)
+    dataset_output = f"{training_path}/dt={end_date.strftime('%Y-%m-%d')}"
     
-    # Save metadata
     metadata = {
         "created_at": datetime.utcnow().isoformat(),
         "start_date": start_date.isoformat(),
         "end_date": end_date.isoformat(),
-        "train_count": train_df.count(),
-        "val_count": val_df.count(),
+        "split_mode": split_mode,
         "feature_version": "v1"
     }
     
+    if split_mode == "random":
+        # Train/validation split (80/20)
+        train_df, val_df = training_with_label.randomSplit(
+            [1 - validation_fraction, validation_fraction], seed=42
+        )
+        
+        # Write training set
+        train_output = f"{dataset_output}/train"
+        print(f"Writing training data to {train_output}")
+        train_df.write.mode("overwrite").parquet(train_output)
+        
+        # Write validation set
+        val_output = f"{dataset_output}/validation"
+        print(f"Writing validation data to {val_output}")
+        val_df.write.mode("overwrite").parquet(val_output)
+        
+        metadata["train_count"] = train_df.count()
+        metadata["val_count"] = val_df.count()
+    else:
+        holdout_start_ts = (end_date - timedelta(days=holdout_days)).timestamp()
+        split_df, split_col = assign_split(
+            training_with_label, split_mode, split_key=split_key,
+            validation_fraction=validation_fraction, num_folds=num_folds,
+            holdout_start_ts=holdout_start_ts
+        )
+        
+        # Single pass: every split is a partition of the same write
+        print(f"Writing {split_mode} split data to {dataset_output} partitioned by {split_col}")
+        split_df.write.mode("overwrite").partitionBy(split_col).parquet(dataset_output)
+        
+        # Counts come from the written Parquet, not a re-evaluation of the lineage
+        split_counts = {
+            str(row[split_col]): row["count"]
+            for row in spark.read.parquet(dataset_output).groupBy(split_col).count().collect()
+        }
+        metadata["split_key"] = split_key if split_mode != "time" else "event_time"
+        metadata["split_counts"] = split_counts
+        if split_mode == "kfold":
+            metadata["num_folds"] = num_folds
+        else:
+            metadata["train_count"] = split_counts.get("train", 0)
+            metadata["val_count"] = split_counts.get("validation", 0)
+    
+    if feature_stats:
+        metadata["feature_drift"] = profile_feature_drift(
+            spark, gold_path, start_date, end_date
+        )
+    
     return metadata
 
 
+def profile_feature_drift(spark, gold_path, start_date, end_date):
+    """
+    Roll up per-run feature statistics for the training window and compare
+    the latest day against the rest of the window (sketch merges only)
+    """
+    stats_root = f"{gold_path}/_feature_stats/card_features"
+    dates = [
+        (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
+        for i in range((end_date - start_date).days + 1)
+    ]
+    
+    daily = rollup_daily_stats(spark, stats_root, dates)
+    if len(daily) < 2:
+        print("Not enough daily feature statistics for drift comparison")
+        return {}
+    
+    latest = max(daily)
+    baseline = merge_stats([stats for dt, stats in daily.items() if dt != latest])
+    report = drift_report(baseline, daily[latest])
+    
+    drifted = [name for name, r in report.items() if r["drifted"]]
+    print(f"Feature drift ({latest} vs training window): {drifted or 'none'}")
+    return {"date": latest, "features": report}
+
+
 def build_inference_dataset(spark, gold_path, inference_path):
     """
     Build inference dataset from latest Gold data
@@ -101,6 +224,7 @@ def build_inference_dataset(spark, gold_path, inference_path):
     inference_df = gold_df.filter(
         col("dt").isin([today, yesterday])
     )
+    inference_df = decode_gold(spark, inference_df, gold_path)
     
     # Select features only (no labels)
     inference_features = inference_df.select([
@@ -140,6 +264,7 @@ def save_metadata(spark, bucket, metadata, dataset_type):
 
 
 def main():
+    timer = StartupTimer("build_datasets", started_at=JOB_START)
     args = parse_args()
     
     # Paths
@@ -148,19 +273,29 @@ def main():
     inference_path = f"s3://{args.bucket}/{args.inference_prefix}"
     
     # Create Spark session
-    spark = create_spark_session()
+    spark = create_spark_session(
+        "BuildDatasets", "batch", io_profile=args.io_profile, timer=timer
+    )
     
     try:
         # Build training dataset
-        train_metadata = build_training_dataset(
-            spark, gold_path, training_path, args.lookback_days
-        )
+        with timer.phase("training_dataset"):
+            train_metadata = build_training_dataset(
+                spark, gold_path, training_path, args.lookback_days,
+                feature_stats=args.feature_stats,
+                split_mode=args.split_mode,
+                split_key=args.split_key,
+                validation_fraction=args.validation_fraction,
+                num_folds=args.num_folds,
+                holdout_days=args.holdout_days
+            )
         save_metadata(spark, args.bucket, train_metadata, "training")
         
         # Build inference dataset
-        inference_metadata = build_inference_dataset(
-            spark, gold_path, inference_path
-        )
+        with timer.phase("inference_dataset"):
+            inference_metadata = build_inference_dataset(
+                spark, gold_path, inference_path
+            )
         save_metadata(spark, args.bucket, inference_metadata, "inference")
         
         print("Dataset building completed successfully")
@@ -169,6 +304,7 @@ def main():
         print(f"Error in dataset building: {e}")
         raise
     finally:
+        timer.report()
         spark.stop()
 
 
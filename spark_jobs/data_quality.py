@@ -0,0 +1,225 @@
+"""
+Data Quality Rules
+Author: Patrick Cheung
+
+Declarative validation rules for card transactions, evaluated in a single
+vectorized pass by either Spark (Silver job) or pandas (local scripts).
+Every row gets a `dq_reason_codes` string ("" when valid, otherwise the
+failing rule codes joined by ";"), so failing rows can be quarantined with
+their reasons and per-rule counters aggregated in the same pass.
+
+Rules have a severity: "error" (default) failures go to `dq_reason_codes`
+and quarantine the row; "warn" failures go to `dq_warning_codes` and are
+only counted, the row stays in the pipeline.
+
+Rule checks:
+  not_null        column is null
+  numeric         value present but not castable to a number
+  range           numeric value outside [min, max] (min_exclusive for > min)
+  in_set          value present but not in `values`
+  pattern         value present but not matching regex `pattern`
+  timestamp_skew  epoch seconds later than reference_ts + max_future_seconds
+  reference       value present but not a key of reference dimension `dimension`
+"""
+
+
+REASON_COLUMN = "dq_reason_codes"
+WARNING_COLUMN = "dq_warning_codes"
+REASON_SEPARATOR = ";"
+
+# Active ISO 4217 currency codes
+ISO_CURRENCY_CODES = sorted("""
+AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL
+BSD BTN BWP BYN BZD CAD CDF CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP
+ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD GNF GTQ GYD HKD HNL HTG HUF IDR ILS INR
+IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT LAK LBP LKR LRD LSL
+LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR
+NZD OMR PAB PEN PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD
+SHP SLE SOS SRD SSP STN SVC SYP SZL THB TJS TMT TND TOP TRY TTD TWD TZS UAH UGX
+USD UYU UZS VES VND VUV WST XAF XCD XOF XPF YER ZAR ZMW ZWL
+""".split())
+
+POS_MODES = ["chip", "contactless", "swipe", "magstripe", "online", "manual"]
+
+DEFAULT_RULES = [
+    {"code": "EVENT_ID_NULL", "column": "event_id", "check": "not_null"},
+    {"code": "CARD_ID_NULL", "column": "card_id", "check": "not_null"},
+    {"code": "TS_NULL", "column": "ts", "check": "not_null"},
+    {"code": "AMOUNT_NULL", "column": "amount", "check": "not_null"},
+    {"code": "AMOUNT_TYPE", "column": "amount", "check": "numeric"},
+    {"code": "AMOUNT_RANGE", "column": "amount", "check": "range",
+     "min": 0, "min_exclusive": True, "max": 1000000},
+    # 2020-01-01T00:00:00Z
+    {"code": "TS_RANGE", "column": "ts", "check": "range", "min": 1577836800},
+    {"code": "TS_FUTURE_SKEW", "column": "ts", "check": "timestamp_skew", "max_future_seconds": 300},
+    {"code": "CURRENCY_CODE", "column": "currency", "check": "in_set", "values": ISO_CURRENCY_CODES},
+    {"code": "COUNTRY_CODE", "column": "country", "check": "pattern", "pattern": "^[A-Z]{2}$"},
+    {"code": "POS_MODE", "column": "pos_mode", "check": "in_set", "values": POS_MODES},
+    # Dimensions can lag new merchants/currencies: count, don't quarantine
+    {"code": "MERCHANT_UNKNOWN", "column": "merchant_id", "check": "reference", "dimension": "merchants",
+     "severity": "warn"},
+    {"code": "CURRENCY_NO_FX", "column": "currency", "check": "reference", "dimension": "fx_rates",
+     "severity": "warn"},
+]
+
+
+def rule_column(rule):
+    """
+    Column a rule's failures are recorded in, by severity
+    """
+    return WARNING_COLUMN if rule.get("severity", "error") == "warn" else REASON_COLUMN
+
+
+def active_rules(rules, references=None, reference_ts=None):
+    """
+    Rules that can be evaluated with the given context; reference checks need
+    their dimension and skew checks need a reference timestamp
+    """
+    references = references or {}
+    active = []
+    for rule in rules:
+        if rule["check"] == "reference" and rule["dimension"] not in references:
+            continue
+        if rule["check"] == "timestamp_skew" and reference_ts is None:
+            continue
+        active.append(rule)
+    return active
+
+
+def _spark_failure(rule, reference_ts, reference_flags):
+    from pyspark.sql.functions import col, lit
+
+    c = col(rule["column"])
+    check = rule["check"]
+    if check == "not_null":
+        return c.isNull()
+    if check == "numeric":
+        return c.isNotNull() & c.cast("double").isNull()
+    if check == "range":
+        value = c.cast("double")
+        failure = lit(False)
+        if "min" in rule:
+            failure = failure | (value <= rule["min"] if rule.get("min_exclusive") else value < rule["min"])
+        if "max" in rule:
+            failure = failure | (value > rule["max"])
+        return failure
+    if check == "in_set":
+        return c.isNotNull() & ~c.isin(list(rule["values"]))
+    if check == "pattern":
+        return c.isNotNull() & ~c.rlike(rule["pattern"])
+    if check == "timestamp_skew":
+        return c.cast("double") > lit(reference_ts + rule["max_future_seconds"])
+    if check == "reference":
+        return c.isNotNull() & col(reference_flags[rule["code"]]).isNull()
+    raise ValueError(f"Unsupported rule check: {check}")
+
+
+def validate_spark(df, rules=DEFAULT_RULES, references=None, reference_ts=None):
+    """
+    Add REASON_COLUMN and WARNING_COLUMN to a Spark DataFrame.
+
+    references maps dimension -> (key, value) DataFrame
+    (reference_data.load_reference_tables); key membership is resolved with
+    broadcast left joins.
+    """
+    from pyspark.sql.functions import array, array_compact, broadcast, col, concat_ws, lit, when
+
+    rules = active_rules(rules, references, reference_ts)
+    columns = df.columns
+
+    reference_flags = {}
+    for rule in rules:
+        if rule["check"] != "reference":
+            continue
+        flag = f"_dq_{rule['code'].lower()}"
+        keys = references[rule["dimension"]].select(
+            col("key").alias(rule["column"]), lit(True).alias(flag)
+        )
+        df = df.join(broadcast(keys), on=rule["column"], how="left")
+        reference_flags[rule["code"]] = flag
+
+    for output in (REASON_COLUMN, WARNING_COLUMN):
+        codes = array_compact(array(*[
+            when(_spark_failure(rule, reference_ts, reference_flags), lit(rule["code"]))
+            for rule in rules if rule_column(rule) == output
+        ]))
+        df = df.withColumn(output, concat_ws(REASON_SEPARATOR, codes))
+    return df.select(*columns, REASON_COLUMN, WARNING_COLUMN)
+
+
+def rule_counters_spark(validated_df, rules=DEFAULT_RULES):
+    """
+    Per-rule failure counts plus totals, in one aggregation over validated rows
+    """
+    from pyspark.sql.functions import array_contains, col, count, lit, split, sum as spark_sum, when
+
+    codes = {
+        output: split(col(output), REASON_SEPARATOR) for output in (REASON_COLUMN, WARNING_COLUMN)
+    }
+    aggregations = [
+        spark_sum(when(array_contains(codes[rule_column(rule)], rule["code"]), 1).otherwise(0))
+        .alias(rule["code"])
+        for rule in rules
+    ]
+    aggregations += [
+        count(lit(1)).alias("total_rows"),
+        spark_sum(when(col(REASON_COLUMN) != "", 1).otherwise(0)).alias("quarantined_rows"),
+        spark_sum(when(col(WARNING_COLUMN) != "", 1).otherwise(0)).alias("warned_rows"),
+    ]
+    row = validated_df.agg(*aggregations).first()
+    return {k: int(v or 0) for k, v in row.asDict().items()}
+
+
+def _pandas_failure(df, rule, references, reference_ts):
+    import pandas as pd
+
+    s = df[rule["column"]]
+    check = rule["check"]
+    if check == "not_null":
+        return s.isna()
+    if check == "numeric":
+        return s.notna() & pd.to_numeric(s, errors="coerce").isna()
+    if check == "range":
+        value = pd.to_numeric(s, errors="coerce")
+        failure = pd.Series(False, index=df.index)
+        if "min" in rule:
+            failure |= (value <= rule["min"]) if rule.get("min_exclusive") else (value < rule["min"])
+        if "max" in rule:
+            failure |= value > rule["max"]
+        return failure
+    if check == "in_set":
+        return s.notna() & ~s.isin(set(rule["values"]))
+    if check == "pattern":
+        return s.notna() & ~s.astype(str).str.match(rule["pattern"])
+    if check == "timestamp_skew":
+        return pd.to_numeric(s, errors="coerce") > reference_ts + rule["max_future_seconds"]
+    if check == "reference":
+        return s.notna() & ~s.isin(set(references[rule["dimension"]]))
+    raise ValueError(f"Unsupported rule check: {check}")
+
+
+def validate_pandas(df, rules=DEFAULT_RULES, references=None, reference_ts=None):
+    """
+    Pandas counterpart of validate_spark; returns (DataFrame with
+    REASON_COLUMN and WARNING_COLUMN, per-rule counters).
+
+    references maps dimension -> iterable of valid keys.
+    """
+    rules = active_rules(rules, references, reference_ts)
+    df = df.copy()
+
+    tags = {REASON_COLUMN: None, WARNING_COLUMN: None}
+    counters = {}
+    for rule in rules:
+        failure = _pandas_failure(df, rule, references, reference_ts).fillna(False).astype(bool)
+        counters[rule["code"]] = int(failure.sum())
+        tagged = failure.map({True: rule["code"] + REASON_SEPARATOR, False: ""})
+        output = rule_column(rule)
+        tags[output] = tagged if tags[output] is None else tags[output] + tagged
+
+    for output, tagged in tags.items():
+        df[output] = tagged.str.rstrip(REASON_SEPARATOR) if tagged is not None else ""
+    counters["total_rows"] = len(df)
+    counters["quarantined_rows"] = int((df[REASON_COLUMN] != "").sum())
+    counters["warned_rows"] = int((df[WARNING_COLUMN] != "").sum())
+    return df, counters
@@ -0,0 +1,143 @@
+"""
+Dictionary Encoding for Categorical Columns
+Author: Patrick Cheung
+
+Maps high-cardinality string columns to stable integer surrogate keys via a
+persisted, append-only dictionary per column, so window sorts, shuffles and
+aggregations in the Gold stage run on ints. Strings are decoded only at the
+Feature Store boundary.
+
+Layout: s3://bucket/<gold-prefix>/_dictionaries/<column>/*.parquet (value, code)
+Codes are never reassigned; a run only appends values it has not seen.
+New codes are staged under _staging/ and moved into the dictionary, which is
+then checked for duplicate codes or values: when an overlapping run appended
+under the same codes, this run removes its own files and fails instead of
+leaving a dictionary that decodes to the wrong strings.
+"""
+
+import uuid
+
+from pyspark.sql.functions import (
+    col, broadcast, lit, row_number, count, countDistinct, max as spark_max
+)
+from pyspark.sql.utils import AnalysisException
+from pyspark.sql.window import Window
+
+from feature_groups import ENCODED_COLUMNS
+
+
+def load_dictionary(spark, dictionary_root, column):
+    """
+    Persisted (value, code) dictionary for a column, empty if none yet
+    """
+    try:
+        return spark.read.parquet(f"{dictionary_root}/{column}")
+    except AnalysisException:
+        return spark.createDataFrame([], "value string, code int")
+
+
+def update_dictionary(spark, df, dictionary_root, column):
+    """
+    Append codes for values of `column` not yet in its dictionary and return
+    the full dictionary. New codes follow the current maximum in value order.
+    """
+    existing = load_dictionary(spark, dictionary_root, column)
+
+    new_values = df.select(col(column).alias("value")) \
+        .where(col("value").isNotNull()) \
+        .distinct() \
+        .join(existing, "value", "left_anti")
+
+    max_code = existing.agg(spark_max("code")).first()[0] or 0
+    new_entries = new_values \
+        .withColumn("code", (row_number().over(Window.orderBy("value")) + max_code).cast("int")) \
+        .persist()
+
+    new_count = new_entries.count()
+    if not new_count:
+        new_entries.unpersist()
+        return existing
+
+    print(f"Appending {new_count} new codes to dictionary {column}")
+    run_id = uuid.uuid4().hex
+    staging_path = f"{dictionary_root}/_staging/{column}/{run_id}"
+    new_entries.write.mode("overwrite").parquet(staging_path)
+    new_entries.unpersist()
+    committed = _commit_staged(spark, staging_path, f"{dictionary_root}/{column}", run_id)
+
+    # Re-read (and pin) the dictionary as persisted, then verify it
+    dictionary = spark.read.parquet(f"{dictionary_root}/{column}").persist()
+    total, codes, values = dictionary.agg(
+        count(lit(1)), countDistinct("code"), countDistinct("value")
+    ).first()
+    if not total == codes == values:
+        dictionary.unpersist()
+        fs = _filesystem(spark, committed[0])
+        for path in committed:
+            fs.delete(path, False)
+        raise RuntimeError(
+            f"Dictionary {column} was updated concurrently (rows={total}, codes={codes}, "
+            f"values={values}); removed this run's {len(committed)} files, rerun the window"
+        )
+    return dictionary
+
+
+def _filesystem(spark, path):
+    conf = spark.sparkContext._jsc.hadoopConfiguration()
+    return path.getFileSystem(conf)
+
+
+def _commit_staged(spark, staging_path, target_path, run_id):
+    """
+    Move staged part files into the dictionary directory (names prefixed
+    with the run id); returns the committed Hadoop paths
+    """
+    Path = spark.sparkContext._jvm.org.apache.hadoop.fs.Path
+    staging = Path(staging_path)
+    fs = _filesystem(spark, staging)
+    fs.mkdirs(Path(target_path))
+
+    committed = []
+    for status in fs.listStatus(staging):
+        name = status.getPath().getName()
+        if not name.startswith("part-"):
+            continue
+        target = Path(f"{target_path}/run-{run_id}-{name}")
+        if not fs.rename(status.getPath(), target):
+            raise IOError(f"Could not move {status.getPath()} to {target}")
+        committed.append(target)
+
+    fs.delete(staging, True)
+    return committed
+
+
+def encode_columns(spark, df, dictionary_root, columns=None):
+    """
+    Replace string columns with their integer keys (ENCODED_COLUMNS names)
+    """
+    columns = columns or list(ENCODED_COLUMNS)
+    for column in columns:
+        dictionary = update_dictionary(spark, df, dictionary_root, column)
+        key_column = ENCODED_COLUMNS[column]
+        df = df.join(
+            broadcast(dictionary.select(col("value").alias(column), col("code").alias(key_column))),
+            column,
+            "left"
+        ).drop(column)
+    return df
+
+
+def decode_columns(spark, df, dictionary_root, columns=None):
+    """
+    Restore string columns from their integer keys
+    """
+    columns = columns or [c for c, k in ENCODED_COLUMNS.items() if k in df.columns]
+    for column in columns:
+        key_column = ENCODED_COLUMNS[column]
+        dictionary = load_dictionary(spark, dictionary_root, column)
+        df = df.join(
+            broadcast(dictionary.select(col("code").alias(key_column), col("value").alias(column))),
+            key_column,
+            "left"
+        ).drop(key_column)
+    return df
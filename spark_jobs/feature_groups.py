@@ -0,0 +1,177 @@
+"""
+Feature Group Specs
+Author: Patrick Cheung
+
+Declarative feature-group definitions shared by the Gold job and Feature
+Store registration. Each spec names its entity key, passthrough columns and
+windowed aggregations; the Gold stage computes every spec from one cached
+Silver batch.
+
+Spec format (JSON-compatible):
+{
+  "name": "card_features",                 # Gold output directory
+  "feature_group": "rt_card_features_v1",  # SageMaker Feature Group name
+  "entity_key": "card_id",
+  "columns": {"event_id": "String", "amount": "Fractional"},
+  "aggregations": [
+    {"feature": "txn_count_1h", "agg": "count", "column": "*", "window_seconds": 3600}
+  ]
+}
+"""
+
+import copy
+import json
+
+
+EVENT_TIME_FEATURE = "event_time"
+
+# Dictionary-encoded string column -> integer key column in Gold
+# (spark_jobs/dictionary_encoding.py; decoded by feature_store/backfill_features.py)
+ENCODED_COLUMNS = {
+    "card_id": "card_key",
+    "merchant_id": "merchant_key",
+    "currency": "currency_key",
+    "country": "country_key",
+    "pos_mode": "pos_mode_key",
+}
+
+# Feature Store type produced by each aggregation
+AGGREGATION_TYPES = {
+    "count": "Integral",
+    "count_distinct": "Integral",
+    "sum": "Fractional",
+    "avg": "Fractional",
+    "min": "Fractional",
+    "max": "Fractional",
+}
+
+CARD_FEATURE_GROUP = {
+    "name": "card_features",
+    "feature_group": "rt_card_features_v1",
+    "entity_key": "card_id",
+    "description": "Real-time card transaction features for fraud detection",
+    "columns": {
+        "event_id": "String",
+        "merchant_id": "String",
+        "amount": "Fractional",
+        "currency": "String",
+        "country": "String",
+        "pos_mode": "String",
+    },
+    "aggregations": [
+        {"feature": "txn_count_1h", "agg": "count", "column": "*", "window_seconds": 3600},
+        {"feature": "txn_amount_1h", "agg": "sum", "column": "amount", "window_seconds": 3600},
+        {"feature": "merchant_count_24h", "agg": "count_distinct", "column": "merchant_id",
+         "window_seconds": 86400},
+        {"feature": "avg_amount_7d", "agg": "avg", "column": "amount", "window_seconds": 604800},
+    ],
+    # Added when reference-data enrichment is enabled
+    "enrichment": {
+        "columns": {
+            "merchant_risk_tier": "String",
+            "country_region": "String",
+            "amount_usd": "Fractional",
+        },
+        "aggregations": [
+            {"feature": "txn_amount_usd_1h", "agg": "sum", "column": "amount_usd",
+             "window_seconds": 3600},
+            {"feature": "avg_amount_usd_7d", "agg": "avg", "column": "amount_usd",
+             "window_seconds": 604800},
+        ],
+    },
+}
+
+MERCHANT_FEATURE_GROUP = {
+    "name": "merchant_features",
+    "feature_group": "rt_merchant_features_v1",
+    "entity_key": "merchant_id",
+    "description": "Real-time merchant activity features",
+    "columns": {
+        "event_id": "String",
+        "country": "String",
+    },
+    "aggregations": [
+        {"feature": "merchant_txn_count_1h", "agg": "count", "column": "*", "window_seconds": 3600},
+        {"feature": "merchant_txn_amount_1h", "agg": "sum", "column": "amount", "window_seconds": 3600},
+        {"feature": "merchant_card_count_24h", "agg": "count_distinct", "column": "card_id",
+         "window_seconds": 86400},
+        {"feature": "merchant_max_amount_24h", "agg": "max", "column": "amount", "window_seconds": 86400},
+    ],
+}
+
+FEATURE_GROUPS = {
+    spec["name"]: spec for spec in (CARD_FEATURE_GROUP, MERCHANT_FEATURE_GROUP)
+}
+
+
+def resolve_spec(spec, enriched=False):
+    """
+    Copy of a spec with its enrichment columns/aggregations folded in when enabled
+    """
+    resolved = copy.deepcopy(spec)
+    enrichment = resolved.pop("enrichment", None)
+    if enriched and enrichment:
+        resolved["columns"].update(enrichment.get("columns", {}))
+        resolved["aggregations"].extend(enrichment.get("aggregations", []))
+    return resolved
+
+
+def feature_definitions(spec):
+    """
+    SageMaker FeatureDefinitions for a resolved spec
+    """
+    definitions = [{"FeatureName": spec["entity_key"], "FeatureType": "String"}]
+    definitions += [
+        {"FeatureName": name, "FeatureType": feature_type}
+        for name, feature_type in spec["columns"].items()
+    ]
+    definitions.append({"FeatureName": EVENT_TIME_FEATURE, "FeatureType": "Fractional"})
+    definitions += [
+        {"FeatureName": a["feature"], "FeatureType": AGGREGATION_TYPES[a["agg"]]}
+        for a in spec["aggregations"]
+    ]
+    return definitions
+
+
+def definition_mismatches(spec, group_definitions):
+    """
+    Features of a resolved spec that a Feature Group's FeatureDefinitions
+    lack or type differently; PutRecord rejects records carrying them
+    """
+    group_types = {d["FeatureName"]: d["FeatureType"] for d in group_definitions}
+    return sorted(
+        f"{d['FeatureName']} ({d['FeatureType']})" if d["FeatureName"] not in group_types
+        else f"{d['FeatureName']} ({d['FeatureType']}, group has {group_types[d['FeatureName']]})"
+        for d in feature_definitions(spec)
+        if group_types.get(d["FeatureName"]) != d["FeatureType"]
+    )
+
+
+def parse_feature_group_specs(payload):
+    """
+    Parse a JSON list of specs; entries may be full specs or names of
+    built-in specs, optionally overriding "feature_group"
+    """
+    entries = json.loads(payload)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Feature group specs must be a non-empty JSON list")
+
+    specs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        base = FEATURE_GROUPS.get(entry["name"], {})
+        spec = dict(copy.deepcopy(base), **entry)
+        for required in ("entity_key", "feature_group", "aggregations"):
+            if required not in spec:
+                raise ValueError(f"Feature group spec '{spec['name']}' is missing '{required}'")
+        spec.setdefault("columns", {})
+        specs.append(spec)
+    return specs
+
+
+def default_feature_group_specs(feature_group):
+    """
+    The single card feature group, named as passed on the command line
+    """
+    return [dict(copy.deepcopy(CARD_FEATURE_GROUP), feature_group=feature_group)]
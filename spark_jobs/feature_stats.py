@@ -0,0 +1,412 @@
+"""
+Feature Statistics and Drift Profiling
+Author: Patrick Cheung
+
+Per-run summary statistics for Gold feature columns, computed in a single
+aggregation over the already-materialized Gold batch, plus daily rollups
+and drift comparison that only merge the persisted sketches.
+"""
+
+import json
+import math
+from pyspark.sql.functions import (
+    col, lit, array, struct, explode, when, ceil, log, abs as spark_abs,
+    count, avg, var_pop, min as spark_min, max as spark_max
+)
+from pyspark.sql.types import NumericType
+
+
+# Relative accuracy of the quantile sketch (1% of the true value)
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch with logarithmic buckets (DDSketch style).
+
+    Bucket boundaries only depend on the accuracy, so two sketches with the
+    same accuracy merge exactly by adding bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.positive.values()) + sum(self.negative.values())
+
+    def bucket_index(self, value):
+        return int(math.ceil(math.log(abs(value)) / math.log(self.gamma)))
+
+    def add(self, value, n=1):
+        if value > 0:
+            idx = self.bucket_index(value)
+            self.positive[idx] = self.positive.get(idx, 0) + n
+        elif value < 0:
+            idx = self.bucket_index(value)
+            self.negative[idx] = self.negative.get(idx, 0) + n
+        else:
+            self.zero_count += n
+
+    def add_bucket(self, sign, idx, n):
+        """
+        Add a pre-aggregated bucket count (as produced by Spark)
+        """
+        if sign > 0:
+            self.positive[idx] = self.positive.get(idx, 0) + n
+        elif sign < 0:
+            self.negative[idx] = self.negative.get(idx, 0) + n
+        else:
+            self.zero_count += n
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for idx, n in other.positive.items():
+            self.positive[idx] = self.positive.get(idx, 0) + n
+        for idx, n in other.negative.items():
+            self.negative[idx] = self.negative.get(idx, 0) + n
+        self.zero_count += other.zero_count
+        return self
+
+    def _bucket_value(self, idx):
+        return 2 * self.gamma ** idx / (self.gamma + 1)
+
+    def _ordered_buckets(self):
+        for idx in sorted(self.negative, reverse=True):
+            yield -self._bucket_value(idx), self.negative[idx]
+        if self.zero_count:
+            yield 0.0, self.zero_count
+        for idx in sorted(self.positive):
+            yield self._bucket_value(idx), self.positive[idx]
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        value = None
+        for value, n in self._ordered_buckets():
+            seen += n
+            if seen > rank:
+                return value
+        return value
+
+    def cdf(self, x):
+        """
+        Approximate fraction of values <= x
+        """
+        total = self.count
+        if total == 0:
+            return 0.0
+        seen = 0
+        for value, n in self._ordered_buckets():
+            if value > x:
+                break
+            seen += n
+        return seen / total
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": {str(k): v for k, v in self.positive.items()},
+            "negative": {str(k): v for k, v in self.negative.items()},
+            "zero_count": self.zero_count
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.positive = {int(k): v for k, v in data["positive"].items()}
+        sketch.negative = {int(k): v for k, v in data["negative"].items()}
+        sketch.zero_count = data["zero_count"]
+        return sketch
+
+
+class FeatureStats:
+    """
+    Mergeable summary of one feature column: counts, moments, range and sketch
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.count = 0
+        self.null_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else None
+
+    @property
+    def null_rate(self):
+        total = self.count + self.null_count
+        return self.null_count / total if total else 0.0
+
+    def merge_moments(self, n, mean, m2, min_value, max_value):
+        """
+        Combine count/mean/M2 with another partial aggregate (Chan et al.)
+        """
+        if not n:
+            return self
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min_value if self.min is None else min(self.min, min_value)
+        self.max = max_value if self.max is None else max(self.max, max_value)
+        return self
+
+    def merge(self, other):
+        self.merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        self.null_count += other.null_count
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "variance": self.variance,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.sketch.quantile(0.5),
+            "p95": self.sketch.quantile(0.95),
+            "p99": self.sketch.quantile(0.99),
+            "sketch": self.sketch.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data["count"]
+        stats.null_count = data["null_count"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.min = data["min"]
+        stats.max = data["max"]
+        stats.sketch = QuantileSketch.from_dict(data["sketch"])
+        return stats
+
+
+def numeric_feature_columns(df, exclude=("event_time",)):
+    """
+    Numeric feature columns of a DataFrame, excluding timestamps
+    """
+    return [
+        f.name for f in df.schema.fields
+        if isinstance(f.dataType, NumericType) and f.name not in exclude
+    ]
+
+
+def compute_feature_stats(df, feature_columns=None,
+                          relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Compute FeatureStats for every feature column in one Spark aggregation.
+
+    Columns are unpivoted to (feature, value), bucketed by sign and log index,
+    and aggregated once; only the per-bucket partials reach the driver.
+    """
+    if feature_columns is None:
+        feature_columns = numeric_feature_columns(df)
+    if not feature_columns:
+        return {}
+
+    gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+    long_df = df.select(explode(array(*[
+        struct(lit(c).alias("feature"), col(c).cast("double").alias("value"))
+        for c in feature_columns
+    ])).alias("kv")).select("kv.feature", "kv.value")
+
+    bucketed = long_df \
+        .withColumn(
+            "sign",
+            when(col("value") > 0, lit(1)).when(col("value") < 0, lit(-1)).when(col("value") == 0, lit(0))
+        ) \
+        .withColumn(
+            "bucket",
+            when(col("value") != 0, ceil(log(spark_abs(col("value"))) / math.log(gamma))).otherwise(lit(0))
+        )
+
+    partials = bucketed.groupBy("feature", "sign", "bucket").agg(
+        count(lit(1)).alias("rows"),
+        count("value").alias("n"),
+        avg("value").alias("mean"),
+        var_pop("value").alias("var"),
+        spark_min("value").alias("min"),
+        spark_max("value").alias("max")
+    ).collect()
+
+    stats = {c: FeatureStats(relative_accuracy) for c in feature_columns}
+    for row in partials:
+        feature_stats = stats[row["feature"]]
+        if row["n"] == 0:
+            feature_stats.null_count += row["rows"]
+            continue
+        feature_stats.merge_moments(
+            row["n"], row["mean"], (row["var"] or 0.0) * row["n"], row["min"], row["max"]
+        )
+        feature_stats.sketch.add_bucket(row["sign"], int(row["bucket"]), row["n"])
+
+    return stats
+
+
+def stats_to_json(stats, **extra):
+    payload = dict(extra)
+    payload["features"] = {name: s.to_dict() for name, s in stats.items()}
+    return json.dumps(payload)
+
+
+def stats_from_json(payload):
+    data = json.loads(payload)
+    return {name: FeatureStats.from_dict(d) for name, d in data["features"].items()}
+
+
+def merge_stats(stats_list):
+    """
+    Merge several {feature: FeatureStats} mappings without touching the data
+    """
+    merged = {}
+    for stats in stats_list:
+        for name, s in stats.items():
+            if name in merged:
+                merged[name].merge(s)
+            else:
+                merged[name] = FeatureStats.from_dict(s.to_dict())
+    return merged
+
+
+def write_run_stats(spark, stats, stats_root, dt, run_id):
+    """
+    Persist per-run statistics as a single JSON line (idempotent per run)
+    """
+    output = f"{stats_root}/runs/dt={dt}/run={run_id}"
+    print(f"Writing feature statistics to {output}")
+    spark.createDataFrame([(stats_to_json(stats, dt=dt, run_id=run_id),)], ["value"]) \
+        .coalesce(1) \
+        .write \
+        .mode("overwrite") \
+        .text(output)
+
+
+def _list_partitions(spark, path, key):
+    """
+    {value: path} of the key=value directories directly under path (listing only)
+    """
+    jvm = spark.sparkContext._jvm
+    conf = spark.sparkContext._jsc.hadoopConfiguration()
+    hadoop_path = jvm.org.apache.hadoop.fs.Path(path)
+    fs = hadoop_path.getFileSystem(conf)
+    if not fs.exists(hadoop_path):
+        return {}
+
+    partitions = {}
+    for status in fs.listStatus(hadoop_path):
+        name = status.getPath().getName()
+        if status.isDirectory() and name.startswith(f"{key}="):
+            partitions[name.split("=", 1)[1]] = status.getPath().toString()
+    return partitions
+
+
+def rollup_daily_stats(spark, stats_root, dates):
+    """
+    Merge per-run sketches into one rollup per day and persist it.
+
+    Only the small per-run JSON documents are read; Gold is never rescanned.
+    A day's existing rollup is reused when it already covers every run listed
+    for that day, so only days with new runs are merged and rewritten.
+    Returns {dt: {feature: FeatureStats}} for the days that had runs, or {}
+    when no run has written statistics yet.
+    """
+    run_days = _list_partitions(spark, f"{stats_root}/runs", "dt")
+    day_runs = {
+        dt: sorted(_list_partitions(spark, run_days[dt], "run"))
+        for dt in dates if dt in run_days
+    }
+    day_runs = {dt: run_ids for dt, run_ids in day_runs.items() if run_ids}
+    if not day_runs:
+        print(f"No feature statistics runs found under {stats_root}/runs")
+        return {}
+
+    daily = {}
+    rollup_days = _list_partitions(spark, f"{stats_root}/daily", "dt")
+    existing = [rollup_days[dt] for dt in day_runs if dt in rollup_days]
+    if existing:
+        for row in spark.read.text(existing).collect():
+            payload = json.loads(row["value"])
+            if payload.get("run_ids") == day_runs[payload["dt"]]:
+                daily[payload["dt"]] = stats_from_json(row["value"])
+
+    stale = [dt for dt in day_runs if dt not in daily]
+    if not stale:
+        return daily
+
+    per_day = {}
+    for row in spark.read.text([run_days[dt] for dt in stale], recursiveFileLookup=True).collect():
+        payload = json.loads(row["value"])
+        per_day.setdefault(payload["dt"], []).append(stats_from_json(row["value"]))
+
+    for dt, stats_list in per_day.items():
+        daily[dt] = merge_stats(stats_list)
+        output = f"{stats_root}/daily/dt={dt}"
+        print(f"Writing daily feature statistics rollup to {output} ({len(stats_list)} runs)")
+        payload = stats_to_json(daily[dt], dt=dt, runs=len(stats_list), run_ids=day_runs[dt])
+        spark.createDataFrame([(payload,)], ["value"]) \
+            .coalesce(1) \
+            .write \
+            .mode("overwrite") \
+            .text(output)
+
+    return daily
+
+
+def population_stability_index(baseline, current, bins=10):
+    """
+    PSI of current vs baseline over the baseline's quantile bins
+    """
+    if baseline.sketch.count == 0 or current.sketch.count == 0:
+        return None
+
+    cuts = sorted({baseline.sketch.quantile(i / bins) for i in range(1, bins)})
+    edges = [-math.inf] + cuts + [math.inf]
+
+    psi = 0.0
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        expected = baseline.sketch.cdf(hi) - baseline.sketch.cdf(lo)
+        actual = current.sketch.cdf(hi) - current.sketch.cdf(lo)
+        expected = max(expected, 1e-6)
+        actual = max(actual, 1e-6)
+        psi += (actual - expected) * math.log(actual / expected)
+    return psi
+
+
+def drift_report(baseline, current, psi_threshold=0.2):
+    """
+    Compare current feature stats against a baseline (e.g. the training window)
+    """
+    report = {}
+    for name, base in baseline.items():
+        cur = current.get(name)
+        if cur is None:
+            continue
+        std = math.sqrt(base.variance) if base.variance else None
+        psi = population_stability_index(base, cur)
+        report[name] = {
+            "psi": psi,
+            "mean_shift_std": (cur.mean - base.mean) / std if std else None,
+            "null_rate_delta": cur.null_rate - base.null_rate,
+            "drifted": psi is not None and psi > psi_threshold
+        }
+    return report
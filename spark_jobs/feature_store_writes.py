@@ -0,0 +1,41 @@
+"""
+Feature Store Record Writes
+Author: Patrick Cheung
+
+PutRecord with exponential backoff, shared by the Gold job's upsert and the
+feature_store/ ingestion tools. The Feature Store runtime API has no batch
+put, so callers fan records out across threads. No Spark imports, so the
+pyarrow-only tools can use it.
+"""
+
+import time
+import random
+
+
+# PutRecord errors worth retrying with backoff; anything else fails the record
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException", "Throttling", "ServiceUnavailable", "InternalFailure"
+}
+
+
+def error_code(error):
+    """
+    AWS error code of a botocore ClientError
+    """
+    return error.response["Error"]["Code"]
+
+
+def put_record_with_retry(client, feature_group_name, record, max_attempts=6,
+                          base_delay=0.1, max_delay=5.0):
+    """
+    PutRecord (record = list of FeatureName/ValueAsString dicts), retrying
+    throttling and transient service errors with exponential backoff and
+    jitter; other errors, and the last retryable one, are raised
+    """
+    for attempt in range(max_attempts):
+        try:
+            return client.put_record(FeatureGroupName=feature_group_name, Record=record)
+        except client.exceptions.ClientError as e:
+            if error_code(e) not in RETRYABLE_ERROR_CODES or attempt == max_attempts - 1:
+                raise
+            time.sleep(min(base_delay * 2 ** attempt, max_delay) * random.uniform(0.5, 1.5))
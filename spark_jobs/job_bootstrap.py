@@ -0,0 +1,195 @@
+"""
+Shared Spark Job Bootstrap
+Author: Patrick Cheung
+
+Common SparkSession construction for the jobs in spark_jobs/, with tuned
+presets per job type, a lazily imported boto3 and a startup-phase timer so
+cold-start overhead on EMR Serverless is visible in the job logs.
+
+The jobs use s3:// paths, which EMR serves through EMRFS unless an I/O
+profile routes them to S3A; presets size both so either path is tuned.
+"""
+
+import importlib
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from pyspark.sql import SparkSession
+
+
+# Settings shared by every job
+BASE_CONF = {
+    "spark.sql.adaptive.enabled": "true",
+    "spark.sql.adaptive.coalescePartitions.enabled": "true",
+    "spark.ui.showConsoleProgress": "false",
+}
+
+# Presets selected by job type
+JOB_PRESETS = {
+    # 10-minute cadence, small windows: few shuffle partitions, small S3 pool
+    "stream": {
+        "spark.sql.shuffle.partitions": "32",
+        "spark.sql.adaptive.coalescePartitions.initialPartitionNum": "32",
+        # EMRFS (default s3:// filesystem on EMR)
+        "spark.hadoop.fs.s3.maxConnections": "100",
+        # S3A (when an I/O profile routes s3:// through S3AFileSystem);
+        # uploads and commits share threads.max, the HTTP pool covers both
+        "spark.hadoop.fs.s3a.connection.maximum": "64",
+        "spark.hadoop.fs.s3a.threads.max": "32",
+        "spark.hadoop.fs.s3a.max.total.tasks": "64",
+        "spark.hadoop.fs.s3a.committer.threads": "16",
+        "spark.sql.files.maxPartitionBytes": "64m",
+        "spark.dynamicAllocation.initialExecutors": "1",
+        # Feature groups run as concurrent jobs from one driver
+        "spark.scheduler.mode": "FAIR",
+    },
+    # Daily dataset builds over the training window
+    "batch": {
+        "spark.sql.shuffle.partitions": "200",
+        "spark.hadoop.fs.s3.maxConnections": "500",
+        "spark.hadoop.fs.s3a.connection.maximum": "200",
+        "spark.hadoop.fs.s3a.threads.max": "64",
+        "spark.hadoop.fs.s3a.max.total.tasks": "128",
+        "spark.hadoop.fs.s3a.committer.threads": "32",
+        "spark.sql.files.maxPartitionBytes": "256m",
+    },
+}
+
+# S3A committer settings for the committer-based I/O profile.
+# s3:// is routed through S3AFileSystem so the job paths pick them up.
+_S3A_COMMITTER_CONF = {
+    "spark.hadoop.fs.s3.impl": "org.apache.hadoop.fs.s3a.S3AFileSystem",
+    "spark.hadoop.fs.s3a.aws.credentials.provider":
+        "com.amazonaws.auth.DefaultAWSCredentialsProviderChain",
+    "spark.hadoop.mapreduce.outputcommitter.factory.scheme.s3":
+        "org.apache.hadoop.fs.s3a.commit.S3ACommitterFactory",
+    "spark.hadoop.mapreduce.outputcommitter.factory.scheme.s3a":
+        "org.apache.hadoop.fs.s3a.commit.S3ACommitterFactory",
+    "spark.sql.sources.commitProtocolClass":
+        "org.apache.spark.internal.io.cloud.PathOutputCommitProtocol",
+    "spark.sql.parquet.output.committer.class":
+        "org.apache.spark.internal.io.cloud.BindingParquetOutputCommitter",
+    # Pools are sized per job type in JOB_PRESETS
+    # Fast buffered multipart uploads
+    "spark.hadoop.fs.s3a.fast.upload": "true",
+    "spark.hadoop.fs.s3a.fast.upload.buffer": "bytebuffer",
+    "spark.hadoop.fs.s3a.fast.upload.active.blocks": "4",
+    "spark.hadoop.fs.s3a.multipart.size": "64M",
+    # Adaptive reads: sequential for the Bronze JSON scan, switching to
+    # random IO on backward seeks
+    "spark.hadoop.fs.s3a.experimental.input.fadvise": "normal",
+}
+
+# I/O profiles selectable per job run
+IO_PROFILES = {
+    # Default S3 settings and rename-based commit
+    "default": {},
+    # Magic committer: task output is uploaded as pending multipart uploads
+    # and only completed at job commit, so no renames and no partial output
+    "magic": dict(_S3A_COMMITTER_CONF, **{
+        "spark.hadoop.fs.s3a.committer.name": "magic",
+        "spark.hadoop.fs.s3a.committer.magic.enabled": "true",
+    }),
+    # The staging committers are not offered: they hand pending uploads to
+    # the driver through the cluster filesystem, which EMR Serverless lacks
+}
+
+
+class StartupTimer:
+    """
+    Records wall-clock duration of named job phases
+
+    Pass the perf_counter() value taken before the job's heavy imports as
+    started_at to also record module load time as the "imports" phase.
+    """
+
+    def __init__(self, job_name, started_at=None):
+        self.job_name = job_name
+        now = time.perf_counter()
+        self.started_at = started_at if started_at is not None else now
+        self.phases = []
+        if started_at is not None:
+            self.phases.append(("imports", now - started_at))
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        """
+        Print phase timings as a single JSON line and return them
+        """
+        timings = {
+            "job": self.job_name,
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases},
+            "total_seconds": round(time.perf_counter() - self.started_at, 3),
+        }
+        print(f"JOB_TIMINGS {json.dumps(timings)}")
+        return timings
+
+
+_modules = {}
+_clients = {}
+_clients_lock = threading.Lock()
+_session = None
+
+
+def lazy_import(module_name):
+    """
+    Import a module on first use instead of at job load
+    """
+    if module_name not in _modules:
+        _modules[module_name] = importlib.import_module(module_name)
+    return _modules[module_name]
+
+
+def get_boto3_client(service_name, **kwargs):
+    """
+    Cached boto3 client; boto3 is only imported when a client is needed.
+    Clients come from one dedicated boto3 Session and are created under a
+    lock, so threads upserting Feature Groups concurrently can share them.
+    """
+    global _session
+    key = (service_name, tuple(sorted(kwargs.items())))
+    with _clients_lock:
+        if key not in _clients:
+            if _session is None:
+                _session = lazy_import("boto3.session").Session()
+            _clients[key] = _session.client(service_name, **kwargs)
+        return _clients[key]
+
+
+def build_spark_conf(job_type, io_profile="default", extra_conf=None):
+    """
+    Resolve the Spark configuration for a job type and I/O profile
+    """
+    if job_type not in JOB_PRESETS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    if io_profile not in IO_PROFILES:
+        raise ValueError(f"Unknown I/O profile: {io_profile}")
+    conf = dict(BASE_CONF)
+    conf.update(JOB_PRESETS[job_type])
+    conf.update(IO_PROFILES[io_profile])
+    conf.update(extra_conf or {})
+    return conf
+
+
+def create_spark_session(app_name, job_type, io_profile="default", extra_conf=None, timer=None):
+    """
+    Build (or reuse) the SparkSession for a job using its preset
+    """
+    conf = build_spark_conf(job_type, io_profile, extra_conf)
+
+    with timer.phase("spark_session") if timer else nullcontext():
+        builder = SparkSession.builder.appName(app_name)
+        for key, value in conf.items():
+            builder = builder.config(key, value)
+        spark = builder.getOrCreate()
+
+    return spark
@@ -0,0 +1,95 @@
+"""
+Reference Data Dimensions
+Author: Patrick Cheung
+
+Versioned dimension tables (merchant, country, FX rates) applied as
+broadcast lookups, so enrichment ships each small table once per executor
+instead of shuffling the batch.
+
+Layout: s3://bucket/<reference-prefix>/<dimension>/version=<N>/*.parquet
+
+The first run that sees a new version writes a compact (key, value)
+snapshot to <reference-prefix>/_compact/<dimension>/version=<N>/; later runs
+read that single small file instead of the full dimension table.
+"""
+
+from pyspark.sql.functions import broadcast, col
+from pyspark.sql.utils import AnalysisException
+
+
+# dimension name -> (key column, value column)
+DIMENSIONS = {
+    "merchants": ("merchant_id", "risk_tier"),
+    "countries": ("country", "region"),
+    "fx_rates": ("currency", "rate_to_usd"),
+}
+
+COMPACT_DIR = "_compact"
+
+
+def latest_version(spark, dimension_path):
+    """
+    Highest version=N directory under a dimension path (listing only)
+    """
+    jvm = spark.sparkContext._jvm
+    conf = spark.sparkContext._jsc.hadoopConfiguration()
+    path = jvm.org.apache.hadoop.fs.Path(dimension_path)
+    fs = path.getFileSystem(conf)
+
+    versions = []
+    for status in fs.listStatus(path):
+        name = status.getPath().getName()
+        if status.isDirectory() and name.startswith("version="):
+            versions.append(int(name.split("=", 1)[1]))
+
+    if not versions:
+        raise FileNotFoundError(f"No version=N directories under {dimension_path}")
+    return max(versions)
+
+
+def load_dimension(spark, reference_path, dimension):
+    """
+    Return (version, cached (key, value) DataFrame) for the latest version,
+    building its compact snapshot only when the version is new
+    """
+    key_col, value_col = DIMENSIONS[dimension]
+    version = latest_version(spark, f"{reference_path}/{dimension}")
+    compact_path = f"{reference_path}/{COMPACT_DIR}/{dimension}/version={version}"
+
+    try:
+        table = spark.read.parquet(compact_path)
+    except AnalysisException:
+        print(f"Building compact snapshot of {dimension} version {version}")
+        spark.read.parquet(f"{reference_path}/{dimension}/version={version}") \
+            .select(col(key_col).alias("key"), col(value_col).alias("value")) \
+            .dropna(subset=["key"]) \
+            .dropDuplicates(["key"]) \
+            .coalesce(1) \
+            .write \
+            .mode("overwrite") \
+            .parquet(compact_path)
+        table = spark.read.parquet(compact_path)
+
+    return version, table.cache()
+
+
+def load_reference_tables(spark, reference_path):
+    """
+    Load every dimension and return ({dimension: (key, value) DataFrame},
+    {dimension: version})
+    """
+    tables = {}
+    versions = {}
+    for dimension in DIMENSIONS:
+        versions[dimension], tables[dimension] = load_dimension(spark, reference_path, dimension)
+    return tables, versions
+
+
+def join_lookup(df, table, column, alias):
+    """
+    Add `alias` = value of `table` for df[column] via a broadcast left join
+    (null when the key is missing); df's column order is preserved
+    """
+    lookup = table.select(col("key").alias(column), col("value").alias(alias))
+    return df.join(broadcast(lookup), on=column, how="left") \
+        .select(*df.columns, alias)
@@ -6,17 +6,40 @@ Reads Bronze streaming data, cleans it (Silver),
 performs feature engineering (Gold), and upserts to SageMaker Feature Store.
 """
 
+import time
+JOB_START = time.perf_counter()
+
 import sys
+import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from pyspark.sql import SparkSession
 from pyspark.sql.functions import (
-    col, lit, from_unixtime, unix_timestamp, window,
-    count, sum as spark_sum, avg, countDistinct, 
-    row_number, coalesce
+    col, lit, unix_timestamp, window, split, array_contains,
+    count, sum as spark_sum, avg,
+    row_number, coalesce, size, collect_set,
+    min as spark_min, max as spark_max
 )
+from pyspark.sql.types import IntegralType
 from pyspark.sql.window import Window
-import boto3
+
+from job_bootstrap import IO_PROFILES, StartupTimer, create_spark_session, get_boto3_client
+from feature_store_writes import put_record_with_retry
+from feature_stats import compute_feature_stats, numeric_feature_columns, write_run_stats
+from reference_data import join_lookup, load_reference_tables
+from data_quality import (
+    DEFAULT_RULES, REASON_COLUMN, REASON_SEPARATOR, WARNING_COLUMN, active_rules,
+    rule_counters_spark, validate_spark
+)
+from dictionary_encoding import ENCODED_COLUMNS, encode_columns, decode_columns
+from feature_groups import (
+    EVENT_TIME_FEATURE, default_feature_group_specs, definition_mismatches,
+    parse_feature_group_specs, resolve_spec
+)
+
+
+# Feature Store upsert concurrency
+UPSERT_WORKERS = 8
 
 
 def parse_args():
@@ -25,26 +48,36 @@ def parse_args():
     parser.add_argument("--bronze-prefix", required=True, help="Bronze prefix")
     parser.add_argument("--silver-prefix", required=True, help="Silver prefix")
     parser.add_argument("--gold-prefix", required=True, help="Gold prefix")
-    parser.add_argument("--feature-group", required=True, help="Feature Group name")
+    parser.add_argument("--feature-group", help="Feature Group name for the default card feature group")
+    parser.add_argument("--feature-group-specs",
+                        help="JSON file (local or S3) with a list of feature group specs")
     parser.add_argument("--window-end-ts", required=True, help="Window end timestamp")
     parser.add_argument("--lookback-minutes", type=int, default=60, help="Lookback minutes")
     parser.add_argument("--watermark-delay-minutes", type=int, default=2, help="Watermark delay")
-    return parser.parse_args()
-
-
-def create_spark_session():
-    return SparkSession.builder \
-        .appName("SilverGoldProcessing") \
-        .config("spark.sql.adaptive.enabled", "true") \
-        .config("spark.sql.adaptive.coalescePartitions.enabled", "true") \
-        .config("spark.hadoop.fs.s3a.aws.credentials.provider", 
-                "com.amazonaws.auth.DefaultAWSCredentialsProviderChain") \
-        .getOrCreate()
+    parser.add_argument("--quarantine-prefix", default="quarantine",
+                        help="Prefix for rows failing data-quality rules")
+    parser.add_argument("--reference-prefix", help="Reference dimensions prefix (enables enrichment)")
+    parser.add_argument("--dictionary-encode", action="store_true",
+                        help="Encode categorical columns to integer keys in the Gold stage")
+    parser.add_argument("--emit-feature-stats", action="store_true",
+                        help="Emit per-run feature statistics alongside the Gold write")
+    parser.add_argument("--io-profile", choices=sorted(IO_PROFILES), default="default",
+                        help="S3 I/O profile (committer, upload and read tuning)")
+    args = parser.parse_args()
+    if not args.feature_group and not args.feature_group_specs:
+        parser.error("one of --feature-group or --feature-group-specs is required")
+    return args
 
 
-def process_bronze_to_silver(spark, bronze_path, silver_path, window_start, window_end):
+def process_bronze_to_silver(spark, bronze_path, silver_path, window_start, window_end,
+                             quarantine_path=None, references=None):
     """
     Read Bronze data and clean to Silver layer
+    
+    Rows are validated against data_quality.DEFAULT_RULES in one pass; rows
+    failing any rule go to the quarantine prefix with their reason codes.
+    Rows after the window end are quarantined when they fail TS_FUTURE_SKEW
+    against window_end and otherwise left for the next window.
     """
     print(f"Reading Bronze data from {bronze_path}")
     print(f"Window: {window_start} to {window_end}")
@@ -52,22 +85,45 @@ def process_bronze_to_silver(spark, bronze_path, silver_path, window_start, wind
     # Read Bronze data
     bronze_df = spark.read.json(f"{bronze_path}/*.json.gz")
     
-    # Filter by window
-    filtered_df = bronze_df.filter(
-        (col("ts") >= unix_timestamp(lit(window_start))) &
-        (col("ts") <= unix_timestamp(lit(window_end)))
-    )
+    # Filter by window start only; rows after the window end still need the skew check
+    window_end_ts = spark.range(1).select(unix_timestamp(lit(window_end))).first()[0]
+    filtered_df = bronze_df.filter(col("ts") >= unix_timestamp(lit(window_start)))
     
-    # Data cleaning and validation
-    silver_df = filtered_df \
-        .filter(col("event_id").isNotNull()) \
-        .filter(col("card_id").isNotNull()) \
-        .filter(col("amount") > 0) \
+    # Data quality validation (referential rules only when dimensions are
+    # configured, future skew measured against window_end). Past the window
+    # end, only rows failing the skew check are kept, for quarantine.
+    rules = active_rules(DEFAULT_RULES, references, reference_ts=window_end_ts)
+    validated_df = validate_spark(
+        filtered_df, rules, references=references, reference_ts=window_end_ts
+    ).filter(
+        (col("ts") <= lit(window_end_ts)) |
+        array_contains(split(col(REASON_COLUMN), REASON_SEPARATOR), "TS_FUTURE_SKEW")
+    ).persist()
+    
+    dt = window_end.split("T")[0]
+    
+    # Per-rule counters from the cached batch
+    counters = rule_counters_spark(validated_df, rules)
+    publish_data_quality_metrics(counters)
+    
+    # Quarantine failing rows with their reason codes
+    if quarantine_path and counters["quarantined_rows"]:
+        quarantine_output = f"{quarantine_path}/card_transactions/dt={dt}"
+        print(f"Quarantining {counters['quarantined_rows']} rows to {quarantine_output}")
+        validated_df.filter(col(REASON_COLUMN) != "") \
+            .withColumn("quarantined_at", lit(datetime.utcnow().isoformat())) \
+            .write \
+            .mode("append") \
+            .parquet(quarantine_output)
+    
+    # Data cleaning
+    silver_df = validated_df \
+        .filter(col(REASON_COLUMN) == "") \
+        .drop(REASON_COLUMN, WARNING_COLUMN) \
         .dropDuplicates(["event_id"]) \
         .withColumn("processed_at", lit(datetime.utcnow().isoformat()))
     
     # Write to Silver
-    dt = window_end.split("T")[0]
     silver_output = f"{silver_path}/card_transactions/dt={dt}"
     
     print(f"Writing Silver data to {silver_output}")
@@ -79,50 +135,120 @@ def process_bronze_to_silver(spark, bronze_path, silver_path, window_start, wind
     return silver_df
 
 
-def process_silver_to_gold(spark, silver_df, gold_path, window_end):
+def publish_data_quality_metrics(counters):
+    """
+    Per-rule data-quality counters to CloudWatch (best effort; failures only logged)
+    """
+    print(f"DATA_QUALITY_COUNTERS {json.dumps(counters)}")
+    try:
+        get_boto3_client("cloudwatch").put_metric_data(
+            Namespace="P1Unified",
+            MetricData=[
+                {
+                    "MetricName": "DataQualityFailures",
+                    "Dimensions": [{"Name": "Rule", "Value": name}],
+                    "Value": value,
+                    "Unit": "Count",
+                }
+                for name, value in counters.items()
+                if name not in ("total_rows", "quarantined_rows", "warned_rows")
+            ] + [
+                {"MetricName": "DataQualityRowsChecked", "Value": counters["total_rows"], "Unit": "Count"},
+                {"MetricName": "DataQualityRowsQuarantined", "Value": counters["quarantined_rows"], "Unit": "Count"},
+                {"MetricName": "DataQualityRowsWarned", "Value": counters["warned_rows"], "Unit": "Count"},
+            ]
+        )
+    except Exception as e:
+        print(f"Could not publish data quality metrics: {e}")
+
+
+def enrich_with_reference_data(silver_df, references):
     """
-    Perform feature engineering from Silver to Gold
+    Add merchant risk tier, country region and USD amount from the versioned
+    dimension tables, applied as broadcast lookups (no shuffle of the batch)
     """
-    print("Processing Silver to Gold with feature engineering")
+    enriched_df = join_lookup(silver_df, references["merchants"], "merchant_id", "merchant_risk_tier")
+    enriched_df = join_lookup(enriched_df, references["countries"], "country", "country_region")
+    enriched_df = join_lookup(enriched_df, references["fx_rates"], "currency", "rate_to_usd")
     
-    # Convert timestamp to datetime
-    feature_df = silver_df.withColumn(
-        "event_datetime", 
-        from_unixtime(col("ts"))
-    )
+    return enriched_df \
+        .withColumn("merchant_risk_tier", coalesce(col("merchant_risk_tier"), lit("unknown"))) \
+        .withColumn("country_region", coalesce(col("country_region"), lit("unknown"))) \
+        .withColumn("amount_usd", col("amount") * col("rate_to_usd")) \
+        .drop("rate_to_usd")
+
+
+def prepare_silver_batch(spark, silver_df, gold_path, references=None, dictionary_encode=False):
+    """
+    Apply the batch-wide stages once (enrichment, dictionary encoding) and
+    cache the Silver micro-batch shared by every feature group
+    """
+    if references:
+        silver_df = enrich_with_reference_data(silver_df, references)
+    
+    if dictionary_encode:
+        # Dictionary updates scan the batch once per column; cache it
+        silver_df = encode_columns(spark, silver_df.persist(), f"{gold_path}/_dictionaries")
+    
+    return silver_df.withColumn(EVENT_TIME_FEATURE, col("ts").cast("double")).persist()
+
+
+def aggregation_expr(agg, column, window_spec):
+    """
+    Windowed aggregation for a feature spec entry
+    """
+    if agg == "count":
+        return count(lit(1) if column == "*" else col(column)).over(window_spec)
+    if agg == "count_distinct":
+        # countDistinct is not supported over windows; size(collect_set) is
+        return size(collect_set(column).over(window_spec))
+    if agg == "sum":
+        return spark_sum(column).over(window_spec)
+    if agg == "avg":
+        return avg(column).over(window_spec)
+    if agg == "min":
+        return spark_min(column).over(window_spec)
+    if agg == "max":
+        return spark_max(column).over(window_spec)
+    raise ValueError(f"Unsupported aggregation: {agg}")
+
+
+def process_silver_to_gold(spark, batch_df, gold_path, window_end, spec,
+                           emit_feature_stats=False, dictionary_encode=False):
+    """
+    Perform feature engineering from Silver to Gold for one feature group
     
-    # Window specs for aggregations
-    window_1h = Window.partitionBy("card_id").orderBy("ts").rangeBetween(-3600, 0)
-    window_24h = Window.partitionBy("card_id").orderBy("ts").rangeBetween(-86400, 0)
-    window_7d = Window.partitionBy("card_id").orderBy("ts").rangeBetween(-604800, 0)
+    The Gold batch is cached so that the optional feature statistics and the
+    Feature Store upsert reuse it instead of recomputing the window lineage.
+    With dictionary_encode, categorical columns are integer keys (see
+    dictionary_encoding.ENCODED_COLUMNS) through every window and shuffle.
+    """
+    print(f"Processing Silver to Gold for {spec['name']} (entity: {spec['entity_key']})")
     
-    # Feature engineering
-    gold_df = feature_df \
-        .withColumn("txn_count_1h", count("*").over(window_1h)) \
-        .withColumn("txn_amount_1h", spark_sum("amount").over(window_1h)) \
-        .withColumn("merchant_count_24h", countDistinct("merchant_id").over(window_24h)) \
-        .withColumn("avg_amount_7d", avg("amount").over(window_7d)) \
-        .withColumn("event_time", col("ts").cast("double"))
+    names = ENCODED_COLUMNS if dictionary_encode else {}
+    entity = names.get(spec["entity_key"], spec["entity_key"])
+    
+    # One window spec per distinct range, partitioned by the entity key
+    windows = {}
+    gold_df = batch_df
+    for a in spec["aggregations"]:
+        seconds = a["window_seconds"]
+        if seconds not in windows:
+            windows[seconds] = Window.partitionBy(entity).orderBy("ts").rangeBetween(-seconds, 0)
+        column = a["column"] if a["column"] == "*" else names.get(a["column"], a["column"])
+        gold_df = gold_df.withColumn(a["feature"], aggregation_expr(a["agg"], column, windows[seconds]))
     
     # Select final features
     gold_features = gold_df.select(
-        "card_id",
-        "event_id",
-        "merchant_id",
-        "amount",
-        "currency",
-        "country",
-        "pos_mode",
-        "event_time",
-        "txn_count_1h",
-        "txn_amount_1h",
-        "merchant_count_24h",
-        "avg_amount_7d"
-    )
+        entity,
+        *[names.get(c, c) for c in spec["columns"]],
+        EVENT_TIME_FEATURE,
+        *[a["feature"] for a in spec["aggregations"]]
+    ).persist()
     
     # Write to Gold
     dt = window_end.split("T")[0]
-    gold_output = f"{gold_path}/card_features/dt={dt}"
+    gold_output = f"{gold_path}/{spec['name']}/dt={dt}"
     
     print(f"Writing Gold data to {gold_output}")
     gold_features.write \
@@ -130,6 +256,14 @@ def process_silver_to_gold(spark, silver_df, gold_path, window_end):
         .partitionBy("dt") \
         .parquet(gold_output)
     
+    # Per-run feature statistics from the cached batch (no Gold rescan)
+    if emit_feature_stats:
+        stats = compute_feature_stats(gold_features, numeric_feature_columns(
+            gold_features, exclude=(EVENT_TIME_FEATURE, *ENCODED_COLUMNS.values())
+        ))
+        run_id = window_end.replace("-", "").replace(":", "").split("+")[0]
+        write_run_stats(spark, stats, f"{gold_path}/_feature_stats/{spec['name']}", dt, run_id)
+    
     return gold_features
 
 
@@ -139,48 +273,154 @@ def upsert_to_feature_store(gold_df, feature_group_name):
     """
     print(f"Upserting to Feature Store: {feature_group_name}")
     
+    integral = {
+        f.name for f in gold_df.schema.fields if isinstance(f.dataType, IntegralType)
+    }
+    
     # Convert to Pandas for batch upsert
     features_pd = gold_df.toPandas()
     
-    # Prepare records
+    # Prepare records (nulls are omitted rather than sent as "None")
     records = []
-    for _, row in features_pd.iterrows():
-        record = [
-            {"FeatureName": "card_id", "ValueAsString": str(row["card_id"])},
-            {"FeatureName": "event_id", "ValueAsString": str(row["event_id"])},
-            {"FeatureName": "merchant_id", "ValueAsString": str(row["merchant_id"])},
-            {"FeatureName": "amount", "ValueAsString": str(row["amount"])},
-            {"FeatureName": "currency", "ValueAsString": str(row["currency"])},
-            {"FeatureName": "country", "ValueAsString": str(row["country"])},
-            {"FeatureName": "pos_mode", "ValueAsString": str(row["pos_mode"])},
-            {"FeatureName": "event_time", "ValueAsString": str(row["event_time"])},
-            {"FeatureName": "txn_count_1h", "ValueAsString": str(int(row["txn_count_1h"]))},
-            {"FeatureName": "txn_amount_1h", "ValueAsString": str(row["txn_amount_1h"])},
-            {"FeatureName": "merchant_count_24h", "ValueAsString": str(int(row["merchant_count_24h"]))},
-            {"FeatureName": "avg_amount_7d", "ValueAsString": str(row["avg_amount_7d"])}
-        ]
+    for row in features_pd.to_dict("records"):
+        record = []
+        for name, value in row.items():
+            if value is None or value != value:
+                continue
+            if name in integral:
+                value = int(value)
+            record.append({"FeatureName": name, "ValueAsString": str(value)})
         records.append(record)
     
-    # Batch upsert to Feature Store
-    client = boto3.client("sagemaker-featurestore-runtime")
+    # The runtime API has no batch put: PutRecord per record across a pool
+    client = get_boto3_client("sagemaker-featurestore-runtime")
     
     batch_size = 100
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i+batch_size]
-        try:
-            response = client.batch_put_record(
-                FeatureGroupName=feature_group_name,
-                Records=[{"Record": r} for r in batch]
-            )
-            print(f"Batch {i//batch_size + 1}: Upserted {len(batch)} records")
-        except Exception as e:
-            print(f"Error upserting batch {i//batch_size + 1}: {e}")
-            raise
+    batches = [records[i:i+batch_size] for i in range(0, len(records), batch_size)]
+    
+    def put_batch(indexed_batch):
+        number, batch = indexed_batch
+        for record in batch:
+            put_record_with_retry(client, feature_group_name, record)
+        print(f"{feature_group_name} batch {number}: Upserted {len(batch)} records")
+    
+    with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+        list(executor.map(put_batch, enumerate(batches, start=1)))
+    
+    print(f"Total records upserted to {feature_group_name}: {len(records)}")
+    return len(records)
+
+
+def check_feature_group_schemas(specs):
+    """
+    Fail before any processing when a spec produces features its target
+    Feature Group does not define (e.g. enrichment on a pre-enrichment group)
+    """
+    client = get_boto3_client("sagemaker")
+    problems = {}
+    for spec in specs:
+        described = client.describe_feature_group(FeatureGroupName=spec["feature_group"])
+        mismatches = definition_mismatches(spec, described["FeatureDefinitions"])
+        if mismatches:
+            problems[spec["feature_group"]] = mismatches
+    if problems:
+        raise ValueError(
+            f"Feature Groups do not define the features the job would write: {problems}. "
+            f"Register a version with these features or run without the options that add them."
+        )
+
+
+def run_feature_group(spark, batch_df, gold_path, window_end, spec,
+                      emit_feature_stats=False, dictionary_encode=False):
+    """
+    Gold write and Feature Store upsert for one feature group; returns its metrics
+    """
+    # Separate FAIR scheduler pool per group so concurrent groups share executors
+    spark.sparkContext.setLocalProperty("spark.scheduler.pool", spec["name"])
+    
+    started = time.perf_counter()
+    gold_df = process_silver_to_gold(
+        spark, batch_df, gold_path, window_end, spec,
+        emit_feature_stats=emit_feature_stats, dictionary_encode=dictionary_encode
+    )
+    gold_seconds = time.perf_counter() - started
+    
+    # Strings are only needed at the Feature Store boundary
+    upsert_df = gold_df
+    if dictionary_encode:
+        upsert_df = decode_columns(spark, gold_df, f"{gold_path}/_dictionaries")
+    
+    started = time.perf_counter()
+    records = upsert_to_feature_store(upsert_df, spec["feature_group"])
+    gold_df.unpersist()
+    
+    return {
+        "feature_group": spec["feature_group"],
+        "gold_seconds": round(gold_seconds, 3),
+        "upsert_seconds": round(time.perf_counter() - started, 3),
+        "records_upserted": records,
+    }
+
+
+def publish_feature_group_metrics(metrics):
+    """
+    Per-group CloudWatch metrics (best effort; failures only logged)
+    """
+    print(f"FEATURE_GROUP_METRICS {json.dumps(metrics)}")
+    try:
+        get_boto3_client("cloudwatch").put_metric_data(
+            Namespace="P1Unified",
+            MetricData=[
+                {
+                    "MetricName": name,
+                    "Dimensions": [{"Name": "FeatureGroup", "Value": m["feature_group"]}],
+                    "Value": m[key],
+                    "Unit": unit,
+                }
+                for m in metrics
+                for name, key, unit in (
+                    ("GoldSeconds", "gold_seconds", "Seconds"),
+                    ("UpsertSeconds", "upsert_seconds", "Seconds"),
+                    ("RecordsUpserted", "records_upserted", "Count"),
+                )
+            ]
+        )
+    except Exception as e:
+        print(f"Could not publish feature group metrics: {e}")
+
+
+def run_feature_groups(spark, batch_df, gold_path, window_end, specs,
+                       emit_feature_stats=False, dictionary_encode=False):
+    """
+    Fan out every feature group over the shared cached batch concurrently
+    """
+    metrics = []
+    errors = []
+    # Create the shared client before the fan-out so the threads only reuse it
+    get_boto3_client("sagemaker-featurestore-runtime")
+    with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+        futures = {
+            executor.submit(
+                run_feature_group, spark, batch_df, gold_path, window_end, spec,
+                emit_feature_stats, dictionary_encode
+            ): spec
+            for spec in specs
+        }
+        for future in as_completed(futures):
+            try:
+                metrics.append(future.result())
+            except Exception as e:
+                print(f"Feature group {futures[future]['name']} failed: {e}")
+                errors.append(e)
     
-    print(f"Total records upserted: {len(records)}")
+    publish_feature_group_metrics(metrics)
+    if errors:
+        raise errors[0]
+    return metrics
 
 
 def main():
+    timer = StartupTimer("silver_and_gold", started_at=JOB_START)
     args = parse_args()
     
     # Calculate window
@@ -191,24 +431,57 @@ def main():
     bronze_path = f"s3://{args.bucket}/{args.bronze_prefix}/card_authorization"
     silver_path = f"s3://{args.bucket}/{args.silver_prefix}"
     gold_path = f"s3://{args.bucket}/{args.gold_prefix}"
+    reference_path = f"s3://{args.bucket}/{args.reference_prefix}" if args.reference_prefix else None
+    quarantine_path = f"s3://{args.bucket}/{args.quarantine_prefix}"
+    
+    enriched = reference_path is not None
     
     # Create Spark session
-    spark = create_spark_session()
+    spark = create_spark_session(
+        "SilverGoldProcessing", "stream", io_profile=args.io_profile, timer=timer
+    )
     
     try:
+        # Feature group specs, checked against their Feature Groups up front
+        if args.feature_group_specs:
+            payload = spark.read.text(args.feature_group_specs, wholetext=True).first()[0]
+            specs = parse_feature_group_specs(payload)
+        else:
+            specs = default_feature_group_specs(args.feature_group)
+        specs = [resolve_spec(spec, enriched=enriched) for spec in specs]
+        check_feature_group_schemas(specs)
+        
+        # Reference dimensions, loaded once for validation and enrichment
+        references = None
+        if reference_path:
+            with timer.phase("reference_data"):
+                references, versions = load_reference_tables(spark, reference_path)
+            print(f"Reference data versions: {versions}")
+        
         # Process Bronze to Silver
-        silver_df = process_bronze_to_silver(
-            spark, bronze_path, silver_path, 
-            window_start.isoformat(), window_end.isoformat()
-        )
+        with timer.phase("bronze_to_silver"):
+            silver_df = process_bronze_to_silver(
+                spark, bronze_path, silver_path, 
+                window_start.isoformat(), window_end.isoformat(),
+                quarantine_path=quarantine_path,
+                references=references
+            )
         
-        # Process Silver to Gold
-        gold_df = process_silver_to_gold(
-            spark, silver_df, gold_path, window_end.isoformat()
-        )
+        # Shared Silver micro-batch for all feature groups
+        with timer.phase("prepare_silver_batch"):
+            batch_df = prepare_silver_batch(
+                spark, silver_df, gold_path,
+                references=references,
+                dictionary_encode=args.dictionary_encode
+            )
         
-        # Upsert to Feature Store
-        upsert_to_feature_store(gold_df, args.feature_group)
+        # Process Silver to Gold and upsert to Feature Store, per group
+        with timer.phase("feature_groups"):
+            run_feature_groups(
+                spark, batch_df, gold_path, window_end.isoformat(), specs,
+                emit_feature_stats=args.emit_feature_stats,
+                dictionary_encode=args.dictionary_encode
+            )
         
         print("Silver and Gold processing completed successfully")
         
@@ -216,6 +489,7 @@ def main():
         print(f"Error in processing: {e}")
         raise
     finally:
+        timer.report()
         spark.stop()
 
 
@@ -0,0 +1,88 @@
+"""
+Offline tests for registry-driven Feature Group registration (LocalBackend)
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "feature_store"))
+
+from register_feature_groups import (  # noqa: E402
+    LocalBackend, load_registry, plan_feature_group, register_feature_groups
+)
+
+
+def write_registry(tmp_path, entries):
+    path = tmp_path / "registry.json"
+    path.write_text(json.dumps({
+        "offline_store_s3_uri": "s3://bucket/feature-store/offline",
+        "role_arn": "arn:aws:iam::000000000000:role/FeatureStore",
+        "feature_groups": entries,
+    }))
+    return str(path)
+
+
+def test_plan_create_unchanged_new_version(tmp_path):
+    backend = LocalBackend(polls_until_created=1)
+
+    _, desired = load_registry(write_registry(tmp_path, [
+        {"spec": "card_features", "base_name": "rt_card_features", "feature_group": "rt_card_features_v1"},
+    ]))
+    assert plan_feature_group(backend, desired[0])["action"] == "create"
+
+    plans = register_feature_groups(backend, desired)
+    assert [(p["action"], p["name"]) for p in plans] == [("create", "rt_card_features_v1")]
+    assert backend.describe("rt_card_features_v1")["FeatureGroupStatus"] == "Created"
+
+    plans = register_feature_groups(backend, desired)
+    assert [(p["action"], p["name"]) for p in plans] == [("unchanged", "rt_card_features_v1")]
+
+    _, desired = load_registry(write_registry(tmp_path, [
+        {"spec": "card_features", "base_name": "rt_card_features", "feature_group": "rt_card_features_v2",
+         "enriched": True},
+    ]))
+    plans = register_feature_groups(backend, desired)
+    assert [(p["action"], p["name"]) for p in plans] == [("new_version", "rt_card_features_v2")]
+    assert "amount_usd" in plans[0]["diff"]["added"]
+    assert backend.list_names("rt_card_features") == ["rt_card_features_v1", "rt_card_features_v2"]
+
+
+def test_schema_change_requires_pin_bump(tmp_path):
+    backend = LocalBackend(polls_until_created=1)
+    _, desired = load_registry(write_registry(tmp_path, [
+        {"spec": "card_features", "base_name": "rt_card_features", "feature_group": "rt_card_features_v1"},
+    ]))
+    register_feature_groups(backend, desired)
+
+    _, desired = load_registry(write_registry(tmp_path, [
+        {"spec": "card_features", "base_name": "rt_card_features", "feature_group": "rt_card_features_v1",
+         "enriched": True},
+    ]))
+    with pytest.raises(ValueError):
+        register_feature_groups(backend, desired)
+    assert backend.list_names("rt_card_features") == ["rt_card_features_v1"]
+
+
+def test_local_backend_concurrent_registration(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    backend = LocalBackend(state_file=state_file, polls_until_created=1)
+    _, (config,) = load_registry(write_registry(tmp_path, [{"spec": "merchant_features"}]))
+    desired = [dict(config, base_name=f"group_{i:03d}") for i in range(200)]
+
+    plans = register_feature_groups(backend, desired, max_workers=16)
+
+    assert {p["action"] for p in plans} == {"create"}
+    with open(state_file) as f:
+        assert len(json.load(f)) == 200
+
+
+def test_registry_overrides(tmp_path):
+    _, (config,) = load_registry(
+        write_registry(tmp_path, [{"spec": "merchant_features"}]),
+        role_arn="arn:aws:iam::111111111111:role/deployed", offline_store_s3_uri="s3://deployed/offline",
+    )
+    assert config["role_arn"] == "arn:aws:iam::111111111111:role/deployed"
+    assert config["s3_uri"] == "s3://deployed/offline"